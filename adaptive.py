@@ -0,0 +1,172 @@
+import json
+import os
+import random
+
+# Weight every character keeps, however well it is known, so nothing drops out of a drill.
+MIN_WEIGHT = 0.1
+
+# How far each answer moves a character's error rate and response time.
+SMOOTHING = 0.2
+
+# Error rate assumed for a character that has never been graded.
+INITIAL_ERROR = 0.5
+
+# Responses slower than this count against a character, up to twice as slow.
+TARGET_LATENCY = 1.0
+LATENCY_WEIGHT = 0.5
+
+# Koch progression: start with two characters, and add one once the last
+# KOCH_WINDOW answers are at least KOCH_THRESHOLD correct.
+KOCH_START = 2
+KOCH_WINDOW = 50
+KOCH_THRESHOLD = 0.9
+
+FILE_VERSION = 1
+
+
+class AliasTable:
+    """
+    Draws indices in proportion to a list of weights in constant time.
+
+    Uses Vose's alias method: each of the n slots holds a probability and an
+    alias, so a draw is one random slot and one biased coin. Building the
+    table is O(n).
+
+    Args:
+        weights (list): Non-negative weights, not all zero.
+    """
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = float(sum(weights))
+        scaled = [w * n / total for w in weights]
+        self.probability = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Anything left over is 1 up to rounding error and keeps its own slot.
+
+    def draw(self, rng=random):
+        slot = int(rng.random() * len(self.probability))
+        return slot if rng.random() < self.probability[slot] else self.alias[slot]
+
+
+class LetterWeights:
+    """
+    Per-character error rate and response time, smoothed over recent answers,
+    turned into sampling weights that favour the characters still being missed.
+
+    Recording an answer updates one character in constant time and marks the
+    sampler stale; it is rebuilt once on the next draw.
+
+    Args:
+        order (str): Every character in the order the Koch progression adds them.
+        path (str): JSON file the weights and progression are kept in, or None.
+    """
+
+    def __init__(self, order, path=None):
+        self.order = order
+        self.path = path
+        self.error = {}
+        self.latency = {}
+        self.unlocked = KOCH_START
+        self.recent = []
+        self.samplers = {}
+
+    @classmethod
+    def load(cls, order, path):
+        weights = cls(order, path)
+        if not os.path.exists(path):
+            return weights
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if data.get("version") != FILE_VERSION:
+                return weights
+            for char, entry in data.get("characters", {}).items():
+                weights.error[char] = float(entry["error"])
+                if entry.get("latency") is not None:
+                    weights.latency[char] = float(entry["latency"])
+            koch = data.get("koch", {})
+            weights.unlocked = max(KOCH_START, min(len(order), int(koch.get("unlocked", KOCH_START))))
+            weights.recent = list(koch.get("recent", []))[-KOCH_WINDOW:]
+        except (OSError, AttributeError, KeyError, TypeError, ValueError) as error:
+            print(f"Warning: {path} could not be read ({error!r}); starting with fresh weights.")
+            if not isinstance(error, OSError):
+                # Keep the damaged file for inspection rather than overwriting it.
+                os.replace(path, path + ".corrupt")
+            return cls(order, path)
+        return weights
+
+    def save(self):
+        if self.path is None:
+            return
+        data = {
+            "version": FILE_VERSION,
+            "characters": {
+                char: {"error": round(error, 4), "latency": round(self.latency[char], 3) if char in self.latency else None}
+                for char, error in sorted(self.error.items())
+            },
+            "koch": {"unlocked": self.unlocked, "recent": self.recent},
+        }
+        # Write to a temporary file first so an interrupted save never loses the weights.
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(temp_path, self.path)
+
+    def weight(self, char):
+        weight = MIN_WEIGHT + self.error.get(char, INITIAL_ERROR)
+        latency = self.latency.get(char)
+        if latency is not None and latency > TARGET_LATENCY:
+            weight += LATENCY_WEIGHT * min(1.0, latency / TARGET_LATENCY - 1.0)
+        return weight
+
+    def record(self, char, correct, latency=None):
+        """Fold one graded answer into the character's error rate and response time."""
+        error = self.error.get(char, INITIAL_ERROR)
+        self.error[char] = error + SMOOTHING * ((not correct) - error)
+        if latency is not None:
+            previous = self.latency.get(char)
+            self.latency[char] = latency if previous is None else previous + SMOOTHING * (latency - previous)
+        self.samplers.clear()
+
+        if char in self.koch_letters:
+            self.recent.append(bool(correct))
+            del self.recent[:-KOCH_WINDOW]
+
+    def choose(self, letters, rng=random):
+        """Pick one of letters, weighted towards the weakest."""
+        sampler = self.samplers.get(letters)
+        if sampler is None:
+            sampler = self.samplers[letters] = AliasTable([self.weight(char) for char in letters])
+        return letters[sampler.draw(rng)]
+
+    @property
+    def koch_letters(self):
+        """The characters unlocked so far."""
+        return self.order[:self.unlocked]
+
+    @property
+    def koch_accuracy(self):
+        return sum(self.recent) / len(self.recent) if self.recent else None
+
+    def check_progress(self):
+        """
+        Unlocks the next character once recent accuracy is high enough.
+
+        Returns:
+            str: The character just unlocked, or None.
+        """
+        if (self.unlocked >= len(self.order) or len(self.recent) < KOCH_WINDOW
+                or self.koch_accuracy < KOCH_THRESHOLD):
+            return None
+        self.unlocked += 1
+        self.recent = []
+        return self.order[self.unlocked - 1]
@@ -1,16 +1,8 @@
-def ascii_letter(char):
-    """
-    Returns the ASCII art representation of a single character.
-
-    Args:
-        char (str): A single character (letter, number, or symbol)
+from functools import lru_cache
 
-    Returns:
-        str: The ASCII art representation of the character
-    """
-    # Dictionary mapping characters to their ASCII art
-    ascii_art = {
-        "A": """               AAA               
+# Dictionary mapping characters to their ASCII art, built once at import.
+ASCII_ART = {
+    "A": """               AAA               
               A:::A              
              A:::::A             
             A:::::::A            
@@ -26,7 +18,7 @@ def ascii_letter(char):
   A:::::A               A:::::A  
  A:::::A                 A:::::A 
 AAAAAAA                   AAAAAAA""",
-        "B": """BBBBBBBBBBBBBBBBB                
+    "B": """BBBBBBBBBBBBBBBBB                
 B::::::::::::::::B               
 B::::::BBBBBB:::::B              
 BB:::::B     B:::::B             
@@ -42,7 +34,7 @@ BB:::::BBBBBB::::::B
 B:::::::::::::::::B              
 B::::::::::::::::B               
 BBBBBBBBBBBBBBBBB""",
-        "C": """        CCCCCCCCCCCCC            
+    "C": """        CCCCCCCCCCCCC            
      CCC::::::::::::C            
    CC:::::::::::::::C            
   C:::::CCCCCCCC::::C            
@@ -58,7 +50,7 @@ C:::::C
    CC:::::::::::::::C            
      CCC::::::::::::C            
         CCCCCCCCCCCCC""",
-        "D": """DDDDDDDDDDDDD                    
+    "D": """DDDDDDDDDDDDD                    
 D::::::::::::DDD                 
 D:::::::::::::::DD               
 DDD:::::DDDDD:::::D              
@@ -74,7 +66,7 @@ DDD:::::DDDDD:::::D
 D:::::::::::::::DD               
 D::::::::::::DDD                 
 DDDDDDDDDDDDD""",
-        "E": """EEEEEEEEEEEEEEEEEEEEEE           
+    "E": """EEEEEEEEEEEEEEEEEEEEEE           
 E::::::::::::::::::::E           
 E::::::::::::::::::::E           
 EE::::::EEEEEEEEE::::E           
@@ -90,7 +82,7 @@ EE::::::EEEEEEEE:::::E
 E::::::::::::::::::::E           
 E::::::::::::::::::::E           
 EEEEEEEEEEEEEEEEEEEEEE""",
-        "F": """FFFFFFFFFFFFFFFFFFFFFF           
+    "F": """FFFFFFFFFFFFFFFFFFFFFF           
 F::::::::::::::::::::F           
 F::::::::::::::::::::F           
 FF::::::FFFFFFFFF::::F           
@@ -106,7 +98,7 @@ FF:::::::FF
 F::::::::FF                      
 F::::::::FF                      
 FFFFFFFFFFF""",
-        "G": """        GGGGGGGGGGGGG            
+    "G": """        GGGGGGGGGGGGG            
      GGG::::::::::::G            
    GG:::::::::::::::G            
   G:::::GGGGGGGG::::G            
@@ -122,7 +114,7 @@ G:::::G        G::::G
    GG:::::::::::::::G            
      GGG::::::GGG:::G            
         GGGGGG   GGGG""",
-        "H": """HHHHHHHHH     HHHHHHHHH          
+    "H": """HHHHHHHHH     HHHHHHHHH          
 H:::::::H     H:::::::H          
 H:::::::H     H:::::::H          
 HH::::::H     H::::::HH          
@@ -138,7 +130,7 @@ HH::::::H     H::::::HH
 H:::::::H     H:::::::H          
 H:::::::H     H:::::::H          
 HHHHHHHHH     HHHHHHHHH""",
-        "I": """IIIIIIIIII                       
+    "I": """IIIIIIIIII                       
 I::::::::I                       
 I::::::::I                       
 II::::::II                       
@@ -154,7 +146,7 @@ II::::::II
 I::::::::I                       
 I::::::::I                       
 IIIIIIIIII""",
-        "J": """          JJJJJJJJJJJ            
+    "J": """          JJJJJJJJJJJ            
           J:::::::::J            
           J:::::::::J            
           JJ:::::::JJ            
@@ -170,7 +162,7 @@ J:::::::JJJ:::::::J
  JJ:::::::::::::JJ               
    JJ:::::::::JJ                 
      JJJJJJJJJ""",
-        "K": """KKKKKKKKK    KKKKKKK             
+    "K": """KKKKKKKKK    KKKKKKK             
 K:::::::K    K:::::K             
 K:::::::K    K:::::K             
 K:::::::K   K::::::K             
@@ -186,7 +178,7 @@ K:::::::K   K::::::K
 K:::::::K    K:::::K             
 K:::::::K    K:::::K             
 KKKKKKKKK    KKKKKKK""",
-        "L": """LLLLLLLLLLL                      
+    "L": """LLLLLLLLLLL                      
 L:::::::::L                      
 L:::::::::L                      
 LL:::::::LL                      
@@ -202,7 +194,7 @@ LL:::::::LLLLLLLLL:::::L
 L::::::::::::::::::::::L         
 L::::::::::::::::::::::L         
 LLLLLLLLLLLLLLLLLLLLLLLL""",
-        "M": """MMMMMMMM               MMMMMMMM  
+    "M": """MMMMMMMM               MMMMMMMM  
 M:::::::M             M:::::::M  
 M::::::::M           M::::::::M  
 M:::::::::M         M:::::::::M  
@@ -218,7 +210,7 @@ M::::::M               M::::::M
 M::::::M               M::::::M  
 M::::::M               M::::::M  
 MMMMMMMM               MMMMMMMM""",
-        "N": """NNNNNNNN        NNNNNNNN         
+    "N": """NNNNNNNN        NNNNNNNN         
 N:::::::N       N::::::N         
 N::::::::N      N::::::N         
 N:::::::::N     N::::::N         
@@ -234,7 +226,7 @@ N::::::N      N::::::::N
 N::::::N       N:::::::N         
 N::::::N        N::::::N         
 NNNNNNNN         NNNNNNN""",
-        "O": """     OOOOOOOOO                   
+    "O": """     OOOOOOOOO                   
    OO:::::::::OO                 
  OO:::::::::::::OO               
 O:::::::OOO:::::::O              
@@ -250,7 +242,7 @@ O:::::::OOO:::::::O
  OO:::::::::::::OO               
    OO:::::::::OO                 
      OOOOOOOOO""",
-        "P": """PPPPPPPPPPPPPPPPP                
+    "P": """PPPPPPPPPPPPPPPPP                
 P::::::::::::::::P               
 P::::::PPPPPP:::::P              
 PP:::::P     P:::::P             
@@ -266,7 +258,7 @@ PP::::::PP
 P::::::::P                       
 P::::::::P                       
 PPPPPPPPPP""",
-        "Q": """     QQQQQQQQQ                   
+    "Q": """     QQQQQQQQQ                   
    QQ:::::::::QQ                 
  QQ:::::::::::::QQ               
 Q:::::::QQQ:::::::Q              
@@ -284,7 +276,7 @@ Q:::::::QQ::::::::Q
      QQQQQQQQ::::QQ              
              Q:::::Q             
               QQQQQQ""",
-        "R": """RRRRRRRRRRRRRRRRR                
+    "R": """RRRRRRRRRRRRRRRRR                
 R::::::::::::::::R               
 R::::::RRRRRR:::::R              
 RR:::::R     R:::::R             
@@ -300,7 +292,7 @@ RR:::::R     R:::::R
 R::::::R     R:::::R             
 R::::::R     R:::::R             
 RRRRRRRR     RRRRRRR""",
-        "S": """   SSSSSSSSSSSSSSS               
+    "S": """   SSSSSSSSSSSSSSS               
  SS:::::::::::::::S              
 S:::::SSSSSS::::::S              
 S:::::S     SSSSSSS              
@@ -316,7 +308,7 @@ SSSSSSS     S:::::S
 S::::::SSSSSS:::::S              
 S:::::::::::::::SS               
  SSSSSSSSSSSSSSS""",
-        "T": """TTTTTTTTTTTTTTTTTTTTTTT          
+    "T": """TTTTTTTTTTTTTTTTTTTTTTT          
 T:::::::::::::::::::::T          
 T:::::::::::::::::::::T          
 T:::::TT:::::::TT:::::T          
@@ -332,7 +324,7 @@ TTTTTT  T:::::T  TTTTTT
       T:::::::::T                
       T:::::::::T                
       TTTTTTTTTTT""",
-        "U": """UUUUUUUU     UUUUUUUU            
+    "U": """UUUUUUUU     UUUUUUUU            
 U::::::U     U::::::U            
 U::::::U     U::::::U            
 UU:::::U     U:::::UU            
@@ -348,7 +340,7 @@ UU:::::U     U:::::UU
   UU:::::::::::::UU              
     UU:::::::::UU                
       UUUUUUUUU""",
-        "V": """VVVVVVVV           VVVVVVVV      
+    "V": """VVVVVVVV           VVVVVVVV      
 V::::::V           V::::::V      
 V::::::V           V::::::V      
 V::::::V           V::::::V      
@@ -364,7 +356,7 @@ V::::::V           V::::::V
           V:::::V                
            V:::V                 
             VVV""",
-        "W": """WWWWWWWW                           WWWWWWWW
+    "W": """WWWWWWWW                           WWWWWWWW
 W::::::W                           W::::::W
 W::::::W                           W::::::W
 W::::::W                           W::::::W
@@ -380,7 +372,7 @@ W::::::W                           W::::::W
           W:::::W         W:::::W          
            W:::W           W:::W           
             WWW             WWW""",
-        "X": """XXXXXXX       XXXXXXX            
+    "X": """XXXXXXX       XXXXXXX            
 X:::::X       X:::::X            
 X:::::X       X:::::X            
 X::::::X     X::::::X            
@@ -396,7 +388,7 @@ X::::::X     X::::::X
 X:::::X       X:::::X            
 X:::::X       X:::::X            
 XXXXXXX       XXXXXXX""",
-        "Y": """YYYYYYY       YYYYYYY            
+    "Y": """YYYYYYY       YYYYYYY            
 Y:::::Y       Y:::::Y            
 Y:::::Y       Y:::::Y            
 Y::::::Y     Y::::::Y            
@@ -412,7 +404,7 @@ YYY:::::Y   Y:::::YYY
     YYYY:::::YYYY                
     Y:::::::::::Y                
     YYYYYYYYYYYYY""",
-        "Z": """ZZZZZZZZZZZZZZZZZZZ              
+    "Z": """ZZZZZZZZZZZZZZZZZZZ              
 Z:::::::::::::::::Z              
 Z:::::::::::::::::Z              
 Z:::ZZZZZZZZ:::::Z               
@@ -428,7 +420,7 @@ Z::::::ZZZZZZZZ:::Z
 Z:::::::::::::::::Z              
 Z:::::::::::::::::Z              
 ZZZZZZZZZZZZZZZZZZZ""",
-        "0": """     000000000                   
+    "0": """     000000000                   
    00:::::::::00                 
  00:::::::::::::00               
 0:::::::000:::::::0              
@@ -444,7 +436,7 @@ ZZZZZZZZZZZZZZZZZZZ""",
  00:::::::::::::00               
    00:::::::::00                 
      000000000""",
-        "1": """  1111111                        
+    "1": """  1111111                        
  1::::::1                        
 1:::::::1                        
 111:::::1                        
@@ -460,7 +452,7 @@ ZZZZZZZZZZZZZZZZZZZ""",
 1::::::::::1                     
 1::::::::::1                     
 111111111111""",
-        "2": """ 222222222222222                 
+    "2": """ 222222222222222                 
 2:::::::::::::::22               
 2::::::222222:::::2              
 2222222     2:::::2              
@@ -476,7 +468,7 @@ ZZZZZZZZZZZZZZZZZZZ""",
 2::::::2222222:::::2             
 2::::::::::::::::::2             
 22222222222222222222""",
-        "3": """ 333333333333333                 
+    "3": """ 333333333333333                 
 3:::::::::::::::33               
 3::::::33333::::::3              
 3333333     3:::::3              
@@ -492,7 +484,7 @@ ZZZZZZZZZZZZZZZZZZZ""",
 3::::::33333::::::3              
 3:::::::::::::::33               
  333333333333333""",
-        "4": """       444444444                 
+    "4": """       444444444                 
       4::::::::4                 
      4:::::::::4                 
     4::::44::::4                 
@@ -508,7 +500,7 @@ ZZZZZZZZZZZZZZZZZZZ""",
         44::::::44               
         4::::::::4               
         4444444444""",
-        "5": """555555555555555555               
+    "5": """555555555555555555               
 5::::::::::::::::5               
 5::::::::::::::::5               
 5:::::555555555555               
@@ -524,7 +516,7 @@ ZZZZZZZZZZZZZZZZZZZ""",
  55:::::::::::::55               
    55:::::::::55                 
      555555555""",
-        "6": """        66666666                 
+    "6": """        66666666                 
        6::::::6                  
       6::::::6                   
      6::::::6                    
@@ -540,7 +532,7 @@ ZZZZZZZZZZZZZZZZZZZ""",
  66:::::::::::::66               
    66:::::::::66                 
      666666666""",
-        "7": """77777777777777777777             
+    "7": """77777777777777777777             
 7::::::::::::::::::7             
 7::::::::::::::::::7             
 777777777777:::::::7             
@@ -556,7 +548,7 @@ ZZZZZZZZZZZZZZZZZZZ""",
   7::::::7                       
  7::::::7                        
 77777777""",
-        "8": """     888888888                   
+    "8": """     888888888                   
    88:::::::::88                 
  88:::::::::::::88               
 8::::::88888::::::8              
@@ -572,7 +564,7 @@ ZZZZZZZZZZZZZZZZZZZ""",
  88:::::::::::::88               
    88:::::::::88                 
      888888888""",
-        "9": """     999999999                   
+    "9": """     999999999                   
    99:::::::::99                 
  99:::::::::::::99               
 9::::::99999::::::9              
@@ -588,16 +580,16 @@ ZZZZZZZZZZZZZZZZZZZ""",
      9::::::9                    
     9::::::9                     
    99999999""",
-        ".": """ ......                          
+    ".": """ ......                          
  .::::.                          
  ......""",
-        ",": """ ,,,,,,                          
+    ",": """ ,,,,,,                          
  ,::::,                          
  ,::::,                          
  ,:::,,                          
 ,:::,                            
 ,,,,""",
-        "?": """      ???????                    
+    "?": """      ???????                    
     ??:::::::??                  
   ??:::::::::::?                 
  ?:::::????:::::?                
@@ -616,7 +608,7 @@ ZZZZZZZZZZZZZZZZZZZ""",
         ???                      
        ??:??                     
         ???""",
-        "/": """               ///////           
+    "/": """               ///////           
               /:::::/            
              /:::::/             
             /:::::/              
@@ -632,10 +624,10 @@ ZZZZZZZZZZZZZZZZZZZ""",
   /:::::/                        
  /:::::/                         
 ///////""",
-        "-": """ ---------------                 
+    "-": """ ---------------                 
  -:::::::::::::-                 
  ---------------""",
-        "(": """       ((((((                    
+    "(": """       ((((((                    
      ((::::::(                   
    ((:::::::(                    
   (:::::::((                     
@@ -651,7 +643,7 @@ ZZZZZZZZZZZZZZZZZZZ""",
    ((:::::::(                    
      ((::::::(                   
        (((((( """,
-        ")": """ ))))))                          
+    ")": """ ))))))                          
 )::::::))                        
  ):::::::))                      
   )):::::::)                     
@@ -667,7 +659,60 @@ ZZZZZZZZZZZZZZZZZZZ""",
  ):::::::))                      
 )::::::)                         
  ))))))""",
-        " ": """""",
-    }
+    " ": """""",
+}
+
+# Shown for characters that have no art of their own.
+FALLBACK_CHAR = "?"
+
+# Width of a space between words in ascii_text.
+SPACE_WIDTH = 8
+
+
+def ascii_letter(char):
+    """
+    Returns the ASCII art representation of a single character.
 
-    return ascii_art[char]
+    Args:
+        char (str): A single character (letter, number, or symbol)
+
+    Returns:
+        str: The ASCII art representation of the character, or the art for
+        FALLBACK_CHAR if the character has none.
+    """
+    art = ASCII_ART.get(char)
+    if art is None:
+        art = ASCII_ART.get(char.upper(), ASCII_ART[FALLBACK_CHAR])
+    return art
+
+
+@lru_cache(maxsize=None)
+def _glyph_rows(char):
+    """Returns the art for a character as rows padded to a uniform width."""
+    if char == " ":
+        return (" " * SPACE_WIDTH,)
+    rows = ascii_letter(char).split("\n")
+    width = max(len(row) for row in rows)
+    return tuple(row.ljust(width) for row in rows)
+
+
+def ascii_text(text, spacing=2):
+    """
+    Returns the ASCII art for a whole word, with the characters side by side.
+
+    Args:
+        text (str): The characters to render.
+        spacing (int): Number of blank columns between characters.
+
+    Returns:
+        str: The joined ASCII art, ready to print in one call.
+    """
+    glyphs = [_glyph_rows(char) for char in text]
+    if not glyphs:
+        return ""
+    height = max(len(rows) for rows in glyphs)
+    gap = " " * spacing
+    lines = []
+    for i in range(height):
+        lines.append(gap.join(rows[i] if i < len(rows) else " " * len(rows[0]) for rows in glyphs).rstrip())
+    return "\n".join(lines)
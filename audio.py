@@ -0,0 +1,239 @@
+import io
+import threading
+import time
+import wave
+
+import numpy as np
+
+from stream import BLOCK_FRAMES
+
+BACKENDS = ("pygame", "wav", "null")
+
+
+class AudioBackend:
+    """
+    Somewhere to play rendered Morse code and speech.
+
+    play() starts a sound and returns straight away with its length; callers
+    wait it out themselves and use busy() to see when it has finished. A
+    backend also supplies the output for a stream.AudioStream.
+
+    Args:
+        sample_rate (int): Sample rate buffers are rendered at.
+        channels (int): Channel count buffers are rendered with.
+    """
+    name = None
+
+    def __init__(self, sample_rate=44100, channels=2):
+        self.sample_rate = sample_rate
+        self.channels = channels
+
+    @property
+    def format(self):
+        """Everything a rendered buffer depends on, for cache keys."""
+        return (self.name, self.sample_rate, self.channels)
+
+    def prepare(self, buffer):
+        """Turn an int16 buffer into whatever play() takes. Called once per cached sound."""
+        return buffer
+
+    def play(self, sound):
+        raise NotImplementedError
+
+    def busy(self):
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+    def pause(self):
+        pass
+
+    def resume(self):
+        pass
+
+    def play_wav(self, wav):
+        """Play WAV file bytes to the end. Called from the speech worker thread."""
+        raise NotImplementedError
+
+    def stream_output(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PygameBackend(AudioBackend):
+    """Plays through the sound card with pygame.mixer."""
+    name = "pygame"
+
+    def __init__(self, sample_rate=44100, channels=2):
+        import pygame
+        self.pygame = pygame
+        # Only the mixer is needed; pygame.init() would start every subsystem.
+        pygame.mixer.init(frequency=sample_rate, size=-16, channels=channels)
+        sample_rate, _, channels = pygame.mixer.get_init()
+        super().__init__(sample_rate, channels)
+        self.sound = None
+        self.channel = None
+
+    def prepare(self, buffer):
+        return self.pygame.sndarray.make_sound(buffer)
+
+    def play(self, sound):
+        self.sound = sound
+        self.channel = sound.play()
+        return sound.get_length()
+
+    def busy(self):
+        return self.channel is not None and self.channel.get_busy()
+
+    def stop(self):
+        if self.sound is not None:
+            self.sound.stop()
+
+    def pause(self):
+        self.pygame.mixer.pause()
+
+    def resume(self):
+        self.pygame.mixer.unpause()
+
+    def play_wav(self, wav):
+        sound = self.pygame.mixer.Sound(file=io.BytesIO(wav))
+        sound.play()
+        time.sleep(sound.get_length())
+
+    def stream_output(self):
+        from stream import PygameChannelOutput
+        return PygameChannelOutput()
+
+    def close(self):
+        self.pygame.quit()
+
+
+class ClockedBackend(AudioBackend):
+    """
+    A backend without a sound card that keeps time on the monotonic clock.
+
+    Each sound is taken to start when it is played, or when the one before it
+    ends if that is later, and busy() stays true until its length has passed,
+    so drills run at exactly the speed they would through speakers. Every
+    sound's start time and length in frames is kept in timeline.
+    """
+
+    def __init__(self, sample_rate=44100, channels=2):
+        super().__init__(sample_rate, channels)
+        self.lock = threading.Lock()
+        self.ends_at = 0.0
+        self.paused_at = None
+        self.samples = 0
+        self.sounds = 0
+        self.timeline = []
+
+    def play(self, sound):
+        return self._write(sound, time.monotonic())
+
+    def _write(self, buffer, now):
+        with self.lock:
+            started = max(now, self.ends_at)
+            seconds = len(buffer) / self.sample_rate
+            self.ends_at = started + seconds
+            self.samples += len(buffer)
+            self.sounds += 1
+            self.timeline.append((started, len(buffer)))
+            self.record(buffer, started, now)
+        return seconds
+
+    def record(self, buffer, started, submitted):
+        """Called with each buffer, the clock time it starts at and the time it was handed over."""
+
+    def busy(self):
+        return self.paused_at is not None or time.monotonic() < self.ends_at
+
+    def stop(self):
+        with self.lock:
+            self.ends_at = min(self.ends_at, time.monotonic())
+
+    def pause(self):
+        if self.paused_at is None:
+            self.paused_at = time.monotonic()
+
+    def resume(self):
+        if self.paused_at is None:
+            return
+        with self.lock:
+            # Whatever was still to play picks up where it left off.
+            if self.ends_at > self.paused_at:
+                self.ends_at += time.monotonic() - self.paused_at
+            self.paused_at = None
+
+    def play_wav(self, wav):
+        self.play(self.decode_wav(wav))
+        while self.busy():
+            time.sleep(0.01)
+
+    def decode_wav(self, wav):
+        """int16 samples of WAV file bytes, converted to this backend's rate and channels."""
+        with wave.open(io.BytesIO(wav), 'rb') as f:
+            frames = f.getnframes()
+            if f.getsampwidth() != 2:
+                # Keep the timing right even if the samples can't be used.
+                seconds = frames / f.getframerate()
+                return np.zeros((int(seconds * self.sample_rate), self.channels), dtype=np.int16)
+            samples = np.frombuffer(f.readframes(frames), dtype='<i2').reshape(-1, f.getnchannels())
+            rate = f.getframerate()
+        mono = samples.mean(axis=1)
+        if rate != self.sample_rate:
+            positions = np.arange(int(len(mono) * self.sample_rate / rate)) * rate / self.sample_rate
+            mono = np.interp(positions, np.arange(len(mono)), mono)
+        return np.repeat(mono.astype(np.int16)[:, None], self.channels, axis=1)
+
+    # === Stream output ===
+    def stream_output(self):
+        return self
+
+    def ready(self):
+        # Keep one block queued behind the one playing, like a mixer channel.
+        return self.ends_at - time.monotonic() < BLOCK_FRAMES / self.sample_rate
+
+    def idle(self):
+        return not self.busy()
+
+    def submit(self, block):
+        self._write(block, time.monotonic())
+
+
+class NullBackend(ClockedBackend):
+    """Plays nothing, but counts the samples and keeps the timing, for tests and benchmarks."""
+    name = "null"
+
+
+class WavFileBackend(ClockedBackend):
+    """
+    Writes everything played to a WAV file, with silence for the time between
+    sounds, so the file sounds like the session did through speakers.
+
+    Args:
+        path (str): File to write.
+    """
+    name = "wav"
+
+    def __init__(self, path, sample_rate=44100, channels=1):
+        super().__init__(sample_rate, channels)
+        self.path = path
+        self.file = wave.open(path, 'wb')
+        self.file.setnchannels(channels)
+        self.file.setsampwidth(2)
+        self.file.setframerate(sample_rate)
+        self.file_ends_at = None
+
+    def record(self, buffer, started, submitted):
+        if self.file_ends_at is not None:
+            gap = int(round((started - self.file_ends_at) * self.sample_rate))
+            if gap > 0:
+                self.file.writeframes(bytes(gap * self.channels * 2))
+        self.file.writeframes(np.ascontiguousarray(buffer, dtype='<i2').tobytes())
+        self.file_ends_at = started + len(buffer) / self.sample_rate
+
+    def close(self):
+        self.file.close()
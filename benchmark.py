@@ -0,0 +1,175 @@
+import time
+
+import numpy as np
+
+from audio import NullBackend
+
+# Samples louder than this fraction of full scale count as key-down.
+KEY_DOWN_LEVEL = 0.05
+
+# Quieter stretches shorter than this are the carrier crossing zero, not a gap.
+MERGE_SECONDS = 0.0025
+
+# Gaps of at least this many dots end a character.
+LETTER_GAP_DOTS = 2.0
+
+PERCENTILES = (50, 90, 99)
+
+
+class RecordingBackend(NullBackend):
+    """
+    A null sink that finds every element in the audio it is given and notes
+    when it started and stopped on the monotonic clock.
+
+    Sounds are timed as NullBackend times them, so a late play() shows up as
+    a late element, but an early one is queued behind the sound before it and
+    lands on time. The time each buffer was handed over is kept in submitted
+    so summarize can show both. Only the element edges are kept, not the
+    audio.
+
+    Args:
+        dot (float): Dot length in seconds, used to count characters.
+        stop_after (int): Call on_stop once this many characters have started.
+        on_stop (callable): Called from the playing thread when the limit is reached.
+    """
+    name = "recording"
+
+    def __init__(self, dot, sample_rate=44100, channels=2, stop_after=None, on_stop=None):
+        super().__init__(sample_rate, channels)
+        self.dot = dot
+        self.stop_after = stop_after
+        self.on_stop = on_stop
+        self.threshold = KEY_DOWN_LEVEL * 32767
+        self.merge = int(MERGE_SECONDS * sample_rate)
+        self.starts = []
+        self.stops = []
+        self.characters = 0
+        self.submitted = []
+        # Clock time of the last loud sample, while an element may still be sounding.
+        self.last_loud = None
+
+    def record(self, buffer, started, submitted):
+        self.submitted.append(submitted)
+        loud = np.flatnonzero(np.abs(buffer[:, 0] if buffer.ndim == 2 else buffer) > self.threshold)
+        if not len(loud):
+            return
+        times = started + loud / self.sample_rate
+        # An edge is wherever consecutive loud samples are further apart than the merge window.
+        breaks = np.flatnonzero(np.diff(loud) > self.merge)
+        edge_starts = np.concatenate(([0], breaks + 1))
+        edge_stops = np.concatenate((breaks, [len(loud) - 1]))
+
+        first = 0
+        if self.last_loud is not None and times[0] - self.last_loud <= self.merge / self.sample_rate:
+            # The element carried on from the previous buffer.
+            first = 1
+            self.stops[-1] = times[edge_stops[0]]
+        for start, stop in zip(edge_starts[first:], edge_stops[first:]):
+            self._start(times[start])
+            self.stops.append(times[stop])
+        self.last_loud = times[-1]
+
+    def _start(self, when):
+        if not self.stops or when - self.stops[-1] >= LETTER_GAP_DOTS * self.dot:
+            self.characters += 1
+            if self.stop_after is not None and self.characters >= self.stop_after and self.on_stop:
+                self.on_stop()
+                self.on_stop = None
+        self.starts.append(when)
+
+
+def percentiles(values):
+    if not len(values):
+        return None
+    result = {f"p{p}": float(np.percentile(values, p)) * 1000 for p in PERCENTILES}
+    result["max"] = float(np.max(values)) * 1000
+    return result
+
+
+def summarize(recording, cpu_seconds, wall_seconds, stream_stats=None):
+    """
+    Compares the recorded element edges with the ideal grid of whole dots.
+
+    Every interval between element starts should be a whole number of dots,
+    so each one's error is its distance from the nearest whole number. Drift
+    is the sum of those errors: how far the last element landed from where a
+    perfect clock would have put it. Jitter is the spread of the individual
+    errors.
+
+    The element edges can't show a sound handed over too early, since the
+    sink queues it, so the submit times are checked too. The scheduler plays
+    each sound the length of the last one after it, plus whole dots after a
+    word space; any difference is an early or late play(), and their sum is
+    the drift of the scheduler's own clock. A stream hands blocks over ahead
+    on purpose, so there only a block submitted after the one before it had
+    finished counts, as late: each is a gap in the audio.
+
+    Args:
+        recording (RecordingBackend): The sink the audio was played into.
+        cpu_seconds (float): CPU time the run took.
+        wall_seconds (float): Wall-clock time the run took.
+        stream_stats (dict): AudioStream.stats() of a streamed run.
+
+    Returns:
+        dict: Counts, drift, jitter, element length error, submit drift and
+        early and late submits in milliseconds, CPU time per character, and
+        the stream's underruns and producer waits when it was streamed.
+    """
+    dot = recording.dot
+    starts = np.array(recording.starts)
+    stops = np.array(recording.stops[:len(starts)])
+    intervals = np.diff(starts)
+    interval_errors = intervals - np.round(intervals / dot) * dot
+    lengths = stops - starts
+    length_errors = lengths - np.maximum(1, np.round(lengths / dot)) * dot
+    span = starts[-1] - starts[0] if len(starts) > 1 else 0.0
+    drift = float(interval_errors.sum()) if len(interval_errors) else 0.0
+    characters = recording.characters
+
+    submitted = np.array(recording.submitted)
+    timeline = np.array(recording.timeline).reshape(-1, 2)
+    seconds = timeline[:, 1] / recording.sample_rate
+    if stream_stats is None:
+        gaps = np.diff(submitted) - seconds[:-1]
+        submit_errors = gaps - np.maximum(0, np.round(gaps / dot)) * dot
+        early = -submit_errors[submit_errors < 0]
+        late = submit_errors[submit_errors > 0]
+    else:
+        submit_errors = None
+        gaps = submitted[1:] - (timeline[:-1, 0] + seconds[:-1])
+        early = np.array([])
+        late = gaps[gaps > 0]
+
+    result = {
+        "characters": characters,
+        "elements": len(starts),
+        "audio_seconds": recording.samples / recording.sample_rate,
+        "wall_seconds": wall_seconds,
+        "drift_ms": drift * 1000,
+        "drift_ms_per_minute": drift * 1000 * 60 / span if span else 0.0,
+        "jitter_ms": percentiles(np.abs(interval_errors)),
+        "length_error_ms": percentiles(np.abs(length_errors)),
+        "cpu_ms_per_character": cpu_seconds * 1000 / characters if characters else None,
+        "submit_drift_ms": float(submit_errors.sum()) * 1000 if submit_errors is not None else None,
+        "early_submits": len(early),
+        "early_ms": percentiles(early),
+        "late_submits": len(late),
+        "late_ms": percentiles(late),
+    }
+    if stream_stats is not None:
+        result["underruns"] = stream_stats["underruns"]
+        result["producer_waits"] = stream_stats["producer_waits"]
+    return result
+
+
+class Stopwatch:
+    """Wall-clock and CPU time (all threads) over a with block."""
+
+    def __enter__(self):
+        self.wall_started = time.perf_counter()
+        self.cpu_started = time.process_time()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall_seconds = time.perf_counter() - self.wall_started
+        self.cpu_seconds = time.process_time() - self.cpu_started
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from export import export_audio
+from synth import DEFAULT_RISE_TIME
+from timing import element_durations
+
+MANIFEST_FILE = "manifest.json"
+
+# Set in each worker process by init_worker.
+worker_code_table = None
+
+
+def job_fingerprint(job):
+    """Hash of everything that affects a job's output, used to decide whether to skip it."""
+    return hashlib.sha256(json.dumps(job, sort_keys=True).encode()).hexdigest()
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r') as f:
+            return {entry["file"]: entry for entry in json.load(f)["files"]}
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def save_manifest(path, entries):
+    # Write to a temporary file first so an interrupted run never leaves half a manifest.
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w') as f:
+        json.dump({"files": sorted(entries.values(), key=lambda e: e["file"])}, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def init_worker(code_table):
+    global worker_code_table
+    worker_code_table = code_table
+
+
+def render_job(job, out_dir):
+    """
+    Renders one job to disk inside a worker process.
+
+    The element templates cached by synth.py live for the whole worker, so
+    every job a worker runs at the same speed and frequency reuses them.
+    """
+    path = os.path.join(out_dir, job["file"])
+    timing = element_durations(job["wpm"], job.get("farnsworth", 0))
+    stats = export_audio(job["texts"], path, worker_code_table, job["frequency"], timing,
+                         job.get("sample_rate", 44100), job.get("channels", 1),
+                         job.get("waveform", "sine"), job.get("rise_time", DEFAULT_RISE_TIME))
+    return {
+        "file": job["file"],
+        "wpm": job["wpm"],
+        "farnsworth": job.get("farnsworth", 0),
+        "frequency": job["frequency"],
+        "duration": round(stats["audio_seconds"], 3),
+        "sha256": file_checksum(path),
+        "bytes": os.path.getsize(path),
+        "fingerprint": job_fingerprint(job),
+    }
+
+
+def is_rendered(job, entry, out_dir):
+    if entry is None or entry.get("fingerprint") != job_fingerprint(job):
+        return False
+    path = os.path.join(out_dir, job["file"])
+    return os.path.exists(path) and os.path.getsize(path) == entry.get("bytes")
+
+
+def run_bulk(jobs, out_dir, code_table, workers=None):
+    """
+    Renders many practice files in parallel and records them in a manifest.
+
+    Each job is a dict with "file", "texts", "wpm" and "frequency", and
+    optionally "farnsworth", "waveform", "rise_time", "sample_rate" and
+    "channels". Jobs whose file is already listed in the manifest with the
+    same settings and size are skipped, so an interrupted run picks up where
+    it left off.
+
+    Args:
+        jobs (list): The files to render.
+        out_dir (str): Directory for the audio files and manifest.json.
+        code_table (dict): Mapping of characters to dot-dash patterns.
+        workers (int): Number of worker processes. Defaults to the CPU count.
+
+    Returns:
+        dict: Counts of rendered and skipped files, the seconds of audio
+        rendered and the wall-clock seconds taken.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+    entries = load_manifest(manifest_path)
+
+    pending = [job for job in jobs if not is_rendered(job, entries.get(job["file"]), out_dir)]
+    # Longest jobs first, so no worker is left with a big file at the end.
+    pending.sort(key=lambda job: -sum(len(text) for text in job["texts"]) / job["wpm"])
+
+    started = time.perf_counter()
+    audio_seconds = 0.0
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(code_table,)) as executor:
+        futures = [executor.submit(render_job, job, out_dir) for job in pending]
+        for done, future in enumerate(as_completed(futures), 1):
+            entry = future.result()
+            entries[entry["file"]] = entry
+            audio_seconds += entry["duration"]
+            save_manifest(manifest_path, entries)
+            print(f"[{done}/{len(pending)}] {entry['file']} ({entry['duration']:.1f} s)")
+
+    save_manifest(manifest_path, entries)
+    return {
+        "rendered": len(pending),
+        "skipped": len(jobs) - len(pending),
+        "audio_seconds": audio_seconds,
+        "elapsed_seconds": time.perf_counter() - started,
+    }
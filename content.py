@@ -0,0 +1,152 @@
+import random
+
+# Every character that can be sent. Each gets one bit in a letter mask.
+ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.,?/"
+BITS = {char: 1 << i for i, char in enumerate(ALPHABET)}
+
+VOWELS = set("AEIOUY")
+DIGITS = "0123456789"
+
+# Call sign prefixes: (prefix, weight). US calls are the most common on the air.
+PREFIXES = [
+    ("K", 6), ("N", 6), ("W", 6), ("AA", 1), ("AB", 1), ("AC", 1), ("AD", 1), ("AE", 1), ("AF", 1),
+    ("AG", 1), ("AI", 1), ("AJ", 1), ("AK", 1), ("KA", 2), ("KB", 2), ("KC", 2), ("KD", 2), ("KE", 2),
+    ("KF", 2), ("KG", 2), ("KI", 2), ("KJ", 2), ("KK", 2), ("NA", 1), ("NB", 1), ("NC", 1), ("ND", 1),
+    ("WA", 2), ("WB", 2), ("WD", 1), ("G", 2), ("M", 2), ("F", 2), ("I", 2), ("DL", 2), ("DJ", 1),
+    ("EA", 2), ("ON", 1), ("PA", 1), ("OH", 1), ("SM", 1), ("LA", 1), ("OZ", 1), ("VE", 2), ("VA", 1),
+    ("VK", 1), ("ZL", 1), ("JA", 2), ("JH", 1), ("UA", 1), ("SP", 1), ("OK", 1), ("HB9", 1), ("YU", 1),
+]
+
+# Suffix lengths, weighted towards the usual two and three letters.
+SUFFIX_LENGTHS = [1, 2, 2, 3, 3, 3]
+
+# Chance a call sign gets a portable indicator, and the indicators to choose from.
+PORTABLE_CHANCE = 0.15
+PORTABLE_SUFFIXES = ["/P", "/M", "/MM", "/QRP", "/AM"]
+
+
+def letter_mask(text):
+    """Bitmask of the sendable characters in text. Other characters are ignored."""
+    mask = 0
+    for char in text.upper():
+        mask |= BITS.get(char, 0)
+    return mask
+
+
+class WordPool:
+    """
+    A word list indexed by letter mask, for drawing words that only use certain letters.
+
+    Each word's mask is worked out once. Filtering for a set of letters is one
+    AND per word and the result is cached, so drawing from it is a single
+    random index.
+
+    Args:
+        words (iterable): Words or phrases, in any case.
+    """
+
+    def __init__(self, words):
+        self.words = [word.upper() for word in dict.fromkeys(words)]
+        self.masks = [letter_mask(word) for word in self.words]
+        self.matches = {}
+
+    def matching(self, letters):
+        """Every word that uses only the given letters."""
+        allowed = letter_mask(letters)
+        words = self.matches.get(allowed)
+        if words is None:
+            words = self.matches[allowed] = [
+                word for word, mask in zip(self.words, self.masks) if mask & ~allowed == 0
+            ]
+        return words
+
+
+class ContentGenerator:
+    """
+    Endless practice content from one seedable random number generator.
+
+    Every method returns a generator, so content is made only as it is sent,
+    and the same seed always gives the same sequence.
+
+    Args:
+        seed: Anything random.Random accepts, or None for a different run each time.
+    """
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        prefixes, weights = zip(*PREFIXES)
+        self.prefixes = prefixes
+        self.prefix_weights = weights
+
+    def call_signs(self, portable_chance=PORTABLE_CHANCE):
+        """
+        Call signs built like real ones: a prefix, one call area digit and a
+        one to three letter suffix, sometimes with a portable indicator. A
+        single-letter prefix never gets a one-letter suffix, and suffixes
+        never start with Q, as those are kept for Q codes.
+        """
+        rng = self.rng
+        while True:
+            prefix = rng.choices(self.prefixes, self.prefix_weights)[0]
+            length = rng.choice(SUFFIX_LENGTHS)
+            if len(prefix) == 1 and length == 1:
+                length = 2
+            suffix = rng.choice(ALPHABET[:26].replace("Q", ""))
+            suffix += "".join(rng.choice(ALPHABET[:26]) for _ in range(length - 1))
+            call = f"{prefix}{rng.choice(DIGITS)}{suffix}"
+            if rng.random() < portable_chance:
+                call += rng.choice(PORTABLE_SUFFIXES)
+            yield call
+
+    def pseudo_words(self, letters, min_length=2, max_length=5):
+        """
+        Pronounceable made-up words using only the given letters.
+
+        Consonants and vowels alternate where the letters allow it, so the
+        words sound like words rather than letter groups.
+        """
+        letters = [char for char in dict.fromkeys(letters.upper()) if char.isalpha()]
+        if not letters:
+            raise ValueError("pseudo_words needs at least one letter")
+        vowels = [char for char in letters if char in VOWELS] or letters
+        consonants = [char for char in letters if char not in VOWELS] or letters
+        rng = self.rng
+        while True:
+            length = rng.randint(min_length, max_length)
+            vowel = rng.random() < 0.5
+            word = []
+            for _ in range(length):
+                word.append(rng.choice(vowels if vowel else consonants))
+                vowel = not vowel
+            yield "".join(word)
+
+    def letter_groups(self, letters, size=5):
+        """Groups of size characters drawn evenly from letters."""
+        rng = self.rng
+        while True:
+            yield "".join(rng.choice(letters) for _ in range(size))
+
+    def number_groups(self, size=5):
+        return self.letter_groups(DIGITS, size)
+
+    def words(self, pool, letters, pseudo_word_share=0.0):
+        """
+        Words from pool that use only the given letters, mixed with made-up
+        words in the given share. Falls back to made-up words entirely when
+        no word in the pool fits.
+        """
+        real = pool.matching(letters)
+        made_up = self.pseudo_words(letters)
+        rng = self.rng
+        while True:
+            if not real or rng.random() < pseudo_word_share:
+                yield next(made_up)
+            else:
+                yield rng.choice(real)
+
+    def phrases(self, pool, letters, min_words=3, max_words=5, pseudo_word_share=0.0):
+        """Runs of words from words(), for sentence-length drills."""
+        words = self.words(pool, letters, pseudo_word_share)
+        rng = self.rng
+        while True:
+            yield " ".join(next(words) for _ in range(rng.randint(min_words, max_words)))
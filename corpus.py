@@ -0,0 +1,175 @@
+import mmap
+import os
+import random
+import struct
+import zlib
+from array import array
+from bisect import bisect_right
+
+from content import BITS, letter_mask
+
+# Index files start with this header: magic, version, size and modification
+# time of the word file, checksum of the letter sets, entry count and word count.
+INDEX_MAGIC = b"MCIX"
+INDEX_VERSION = 1
+HEADER = struct.Struct("<4sIQQIII")
+
+# Entry lengths are stored in 16 bits; longer lines are skipped.
+MAX_ENTRY_BYTES = 0xFFFF
+
+
+class Corpus:
+    """
+    A large word or phrase list, indexed by the letters each entry needs.
+
+    The word file is memory-mapped and never read into Python strings as a
+    whole. Each line is given a level: the first of the cumulative letter
+    sets it can be sent with. Entries are sorted by level, words before
+    phrases, so everything sendable with the letters up to a level is one
+    contiguous range of the index and a query is a single lookup. Lines that
+    use characters outside the last letter set are left out.
+
+    The offsets and levels are saved next to the word file in a .idx file and
+    reused while the word file is unchanged, so big lists load quickly.
+
+    Args:
+        path (str): Text file with one word or phrase per line. Lines starting
+            with # are comments.
+        levels (list): Cumulative letter sets, such as the letters taught by
+            the end of each week.
+    """
+
+    def __init__(self, path, levels):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.levels = [letter_mask(letters) for letters in levels]
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        # An empty file can't be mapped, but it has nothing to index either.
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.index_loaded = self._load_index()
+        if not self.index_loaded:
+            self._build_index()
+            self._save_index()
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def entry(self, i):
+        start = self.offsets[i]
+        return self.data[start:start + self.lengths[i]].decode("utf-8", "replace").upper()
+
+    def count(self, level, phrases=False):
+        """How many words (or phrases) can be sent with the letters up to level."""
+        start, ends = (self.word_count, self.phrase_ends) if phrases else (0, self.word_ends)
+        return ends[level] - start
+
+    def sample(self, level, phrases=False, rng=random):
+        """A random word (or phrase) that can be sent with the letters up to level, or None."""
+        start, ends = (self.word_count, self.phrase_ends) if phrases else (0, self.word_ends)
+        if ends[level] == start:
+            return None
+        return self.entry(start + int(rng.random() * (ends[level] - start)))
+
+    def stream(self, level, phrases=False, rng=random):
+        """Endless random entries for level, or nothing if there are none."""
+        while self.count(level, phrases):
+            yield self.sample(level, phrases, rng)
+
+    # === Index ===
+    def _levels_checksum(self):
+        return zlib.crc32(array('Q', self.levels).tobytes())
+
+    def _source_stamp(self):
+        stat = os.fstat(self.file.fileno())
+        return stat.st_size, stat.st_mtime_ns
+
+    def _build_index(self):
+        entries = []
+        data = self.data
+        position = 0
+        end = len(data)
+        while position < end:
+            newline = data.find(b"\n", position)
+            if newline == -1:
+                newline = end
+            line = data[position:newline]
+            stripped = line.strip()
+            if stripped and not stripped.startswith(b"#") and len(stripped) <= MAX_ENTRY_BYTES:
+                text = stripped.decode("utf-8", "replace").upper()
+                level = self._level_of(text)
+                if level is not None:
+                    start = position + len(line) - len(line.lstrip())
+                    entries.append((" " in text, level, start, len(stripped)))
+            position = newline + 1
+
+        entries.sort()
+        self.offsets = array('Q', (entry[2] for entry in entries))
+        self.lengths = array('H', (entry[3] for entry in entries))
+        entry_levels = [entry[1] for entry in entries]
+        self.word_count = sum(1 for entry in entries if not entry[0])
+        self._set_ends(entry_levels)
+
+    def _level_of(self, text):
+        # Characters that can't be sent would be dropped silently; skip the line instead.
+        if any(char not in BITS for char in text.replace(" ", "")):
+            return None
+        mask = letter_mask(text)
+        for level, allowed in enumerate(self.levels):
+            if mask & ~allowed == 0:
+                return level
+        return None
+
+    def _set_ends(self, entry_levels):
+        """word_ends[n] and phrase_ends[n] are one past the last entry usable at level n."""
+        # Levels ascend within the words and within the phrases, so each end is a bisection.
+        self.entry_levels = array('B', entry_levels)
+        count = len(entry_levels)
+        self.word_ends = [bisect_right(self.entry_levels, level, 0, self.word_count)
+                          for level in range(len(self.levels))]
+        self.phrase_ends = [bisect_right(self.entry_levels, level, self.word_count, count)
+                            for level in range(len(self.levels))]
+
+    def _save_index(self):
+        size, mtime = self._source_stamp()
+        header = HEADER.pack(INDEX_MAGIC, INDEX_VERSION, size, mtime, self._levels_checksum(),
+                             len(self.offsets), self.word_count)
+        # Write to a temporary file first so an interrupted save never leaves half an index.
+        temp_path = self.index_path + ".tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(header)
+                self.offsets.tofile(f)
+                self.lengths.tofile(f)
+                self.entry_levels.tofile(f)
+            os.replace(temp_path, self.index_path)
+        except OSError:
+            # A read-only directory only costs the next start a rebuild.
+            pass
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'rb') as f:
+                header = f.read(HEADER.size)
+                if len(header) != HEADER.size:
+                    return False
+                magic, version, size, mtime, checksum, count, word_count = HEADER.unpack(header)
+                if (magic, version, (size, mtime), checksum) != (
+                        INDEX_MAGIC, INDEX_VERSION, self._source_stamp(), self._levels_checksum()):
+                    return False
+                offsets, lengths, entry_levels = array('Q'), array('H'), array('B')
+                offsets.fromfile(f, count)
+                lengths.fromfile(f, count)
+                entry_levels.fromfile(f, count)
+        except (OSError, EOFError, struct.error):
+            return False
+        self.offsets = offsets
+        self.lengths = lengths
+        self.word_count = word_count
+        self._set_ends(entry_levels)
+        return True
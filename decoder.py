@@ -0,0 +1,375 @@
+import time
+import wave
+
+import numpy as np
+
+from morse_tree import DEAD, ROOT
+
+# Length of one analysis frame, in seconds. A dot at 40 WPM spans six frames.
+FRAME_SECONDS = 0.005
+
+# Candidate tone frequencies searched when none is given.
+BANK_FREQUENCIES = np.arange(300, 1250, 50)
+
+# Per-frame decay of the peak level; about a 2.5 s time constant at 5 ms frames.
+PEAK_DECAY = 0.998
+
+# Levels below this fraction of a full-scale tone are never treated as key-down.
+NOISE_GATE = 0.02
+
+# Gaps longer than this many dots end a letter, and this many end a word
+# until the first letter gap has been measured. A letter gap is also never
+# taken as less than LETTER_GAP_DOTS gaps inside a letter.
+LETTER_GAP_DOTS = 2.0
+WORD_GAP_DOTS = 5.0
+
+# A word gap is 7/3 of a letter gap; split the difference between them.
+WORD_GAP_RATIO = 5.0 / 3.0
+
+# Runs shorter than this fraction of the current estimate replace it outright.
+RESET_RATIO = 0.6
+
+# How far each new measurement moves the dot and letter gap estimates.
+SMOOTHING = 0.3
+
+# The dot length is taken as confirmed once the shortest element and the
+# shortest gap heard are within this ratio of each other (a dot and the gap
+# inside a letter are both one dot long) and a letter gap can be told from a
+# word gap, or once this many runs are waiting.
+CONFIRM_RATIO = 2.0
+CONFIRM_RUNS = 40
+
+# When every long gap in a short recording is about the same length, gaps in
+# this range of dots are taken as standard 7-dot word gaps and anything else
+# as letter gaps. If CONFIRM_RUNS are heard first they are letter gaps.
+LONE_WORD_GAP_DOTS = (6.5, 7.5)
+
+# Shown for patterns that are not in the code table.
+UNKNOWN_CHAR = '*'
+
+
+class MorseDecoder:
+    """
+    Decodes Morse code from blocks of int16 samples, one block at a time.
+
+    Each 5 ms frame is run through a bank of single-bin DFT (Goertzel) filters
+    with one matrix product per block. The strongest filter overall is taken as
+    the tone, its level is compared against half of a slowly decaying peak to
+    key it on or off, and the on/off runs are classified against adaptive dot
+    and letter gap lengths, so the speed (and any Farnsworth spacing) is
+    tracked as it changes. Keying shortens elements and lengthens gaps, by a
+    good part of a dot at high speeds and low sample rates, so the gap
+    inside a letter is tracked as well and letters end at a dot plus that
+    gap, halfway to a letter gap. The runs are held back until a dot, a gap inside
+    a letter and the first letter gap have been heard, so a leading dash or a
+    long Farnsworth gap is not misread. Each element steps through the shared
+    MorseTree, and only the samples of a partial frame and the current letter
+    are kept between blocks.
+
+    Args:
+        tree (morse_tree.MorseTree): Index of the patterns to recognise.
+        sample_rate (int): Sample rate of the audio in Hz.
+        frequency (int): Tone frequency, or None to find it automatically.
+        initial_wpm (int): Speed assumed until the first elements are heard,
+            or None to take it from the first element.
+    """
+
+    def __init__(self, tree, sample_rate=44100, frequency=None, initial_wpm=None):
+        self.tree = tree
+        self.frame = max(1, int(round(sample_rate * FRAME_SECONDS)))
+        self.frame_seconds = self.frame / sample_rate
+
+        frequencies = np.array([frequency] if frequency else BANK_FREQUENCIES, dtype=np.float64)
+        window = np.hanning(self.frame)
+        angles = 2 * np.pi * np.outer(np.arange(self.frame), frequencies) / sample_rate
+        self.cos_basis = np.cos(angles) * window[:, None]
+        self.sin_basis = np.sin(angles) * window[:, None]
+        self.frequencies = frequencies
+        self.bin_energy = np.zeros(len(frequencies))
+        # Filter output for a full-scale tone: amplitude * N / 2, halved by the window.
+        self.gate = NOISE_GATE * 32767 * self.frame / 4
+
+        self.leftover = np.zeros(0)
+        self.peak = 0.0
+        self.key_down = False
+        self.run_frames = 0
+        self.node = ROOT
+        # (key_down, frames) runs of the letter in progress, kept so it can be
+        # re-read if the dot estimate drops sharply part way through.
+        self.runs = []
+        self.word_ended = True
+        self.dot_frames = 60.0 / (initial_wpm * 50.0) / self.frame_seconds if initial_wpm else None
+        # (key_down, frames) runs heard before the dot length is confirmed.
+        self.held = []
+        self.confirmed = self.dot_frames is not None
+        # The gap inside a letter; one dot long, give or take the keying.
+        self.gap_frames = self.dot_frames
+        self.letter_gap_frames = None
+        self.samples_decoded = 0
+
+    @property
+    def wpm(self):
+        """Current character speed estimate in words per minute."""
+        if self.dot_frames is None:
+            return None
+        return 60.0 / (self.dot_frames * self.frame_seconds * 50.0)
+
+    @property
+    def frequency(self):
+        """The tone frequency being followed."""
+        return float(self.frequencies[np.argmax(self.bin_energy)])
+
+    def feed(self, samples):
+        """
+        Decodes the next block of audio.
+
+        Args:
+            samples (numpy.ndarray): int16 samples, mono or (samples, channels).
+
+        Returns:
+            str: The characters completed by this block.
+        """
+        samples = np.asarray(samples, dtype=np.float64)
+        if samples.ndim == 2:
+            samples = samples.mean(axis=1)
+        self.samples_decoded += len(samples)
+        samples = np.concatenate((self.leftover, samples))
+        frames = len(samples) // self.frame
+        self.leftover = samples[frames * self.frame:]
+        if frames == 0:
+            return ''
+
+        blocks = samples[:frames * self.frame].reshape(frames, self.frame)
+        power = (blocks @ self.cos_basis) ** 2 + (blocks @ self.sin_basis) ** 2
+        self.bin_energy += power.sum(axis=0)
+        levels = np.sqrt(power[:, np.argmax(self.bin_energy)])
+
+        output = []
+        for level in levels.tolist():
+            self.peak = max(level, self.peak * PEAK_DECAY)
+            down = level > self.gate and level > self.peak / 2
+            if down == self.key_down:
+                self.run_frames += 1
+                if not down:
+                    self._check_gap(output)
+                continue
+            if not self.confirmed:
+                self._hold(output)
+            elif self.key_down:
+                self._end_element(output)
+            else:
+                self._end_gap(output)
+            self.key_down = down
+            self.run_frames = 1
+        return ''.join(output)
+
+    def flush(self):
+        """Finishes the letter in progress at the end of the audio."""
+        output = []
+        if self.key_down:
+            if self.confirmed:
+                self._end_element(output)
+            else:
+                self._hold(output)
+            self.key_down = False
+        if not self.confirmed and self.held:
+            self._confirm(output)
+        if self.node != ROOT:
+            self._end_letter(output)
+        return ''.join(output)
+
+    def _hold(self, output):
+        """Keep the run just ended until the dot length is confirmed."""
+        if not self.key_down and not self.held:
+            # Silence before the first element.
+            return
+        self.held.append((self.key_down, self.run_frames))
+        elements = [run for down, run in self.held if down]
+        gaps = [run for down, run in self.held if not down]
+        if len(self.held) >= CONFIRM_RUNS:
+            self._confirm(output, ended=False)
+        elif gaps:
+            dot = min(min(elements), min(gaps))
+            if min(elements) < CONFIRM_RATIO * dot > min(gaps) and letter_gap_in(elements, gaps) is not None:
+                self._confirm(output, ended=False)
+
+    def _confirm(self, output, ended=True):
+        """Take the dot and letter gap from the held runs, then decode them."""
+        runs = self.held
+        self.held = []
+        self.confirmed = True
+        self.dot_frames = min(run for _, run in runs)
+        self.gap_frames = self.dot_frames
+        elements = [run for down, run in runs if down]
+        gaps = [run for down, run in runs if not down]
+        # Without a gap inside a letter to go by, a long gap may well be a word gap.
+        if gaps and min(gaps) < CONFIRM_RATIO * self.dot_frames:
+            self.gap_frames = min(gaps)
+            self.letter_gap_frames = letter_gap_in(elements, gaps, settle=True, ended=ended)
+        for down, run in runs:
+            self.run_frames = run
+            if down:
+                self._end_element(output)
+            else:
+                # As if heard frame by frame: the letter ends, then perhaps the word.
+                self._check_gap(output)
+                self._check_gap(output)
+                self._end_gap(output)
+
+    def _add_symbol(self, symbol):
+        if self.node != DEAD:
+            self.node = self.tree.step(self.node, symbol)
+
+    def _end_letter(self, output):
+        output.append(self.tree.char_at(self.node) or UNKNOWN_CHAR)
+        self.node = ROOT
+        self.runs = []
+        self.word_ended = False
+
+    def _reread_letter(self, output):
+        """Classify the letter in progress again after the dot estimate dropped."""
+        runs = self.runs
+        self.node = ROOT
+        self.runs = []
+        for down, run in runs:
+            if down:
+                self._add_symbol('.' if run < 2 * self.dot_frames else '-')
+            elif run > self._letter_end_frames():
+                self._end_letter(output)
+                continue
+            self.runs.append((down, run))
+
+    def _end_element(self, output):
+        run = self.run_frames
+        if self.dot_frames is None or run < RESET_RATIO * self.dot_frames:
+            # First element, or much shorter than anything so far: it's a dot.
+            self.dot_frames = run
+            self._reread_letter(output)
+            self._add_symbol('.')
+        elif run < 2 * self.dot_frames:
+            self._add_symbol('.')
+            self.dot_frames += SMOOTHING * (run - self.dot_frames)
+        else:
+            self._add_symbol('-')
+            self.dot_frames += SMOOTHING * (run / 3 - self.dot_frames)
+        self.runs.append((True, run))
+
+    def _letter_end_frames(self):
+        """Gaps longer than this end a letter: two dots, with the keying's share counted once."""
+        return self.dot_frames + self.gap_frames
+
+    def _end_gap(self, output):
+        run = self.run_frames
+        if run <= self._letter_end_frames():
+            # A gap inside a letter.
+            self.runs.append((False, run))
+            if run < RESET_RATIO * self.gap_frames:
+                self.gap_frames = run
+                self._reread_letter(output)
+            else:
+                self.gap_frames += SMOOTHING * (run - self.gap_frames)
+            return
+        # Only a gap well clear of those inside a letter can stand for a letter gap.
+        shortest = LETTER_GAP_DOTS * self.gap_frames
+        if self.letter_gap_frames is None or run < RESET_RATIO * self.letter_gap_frames:
+            if run >= shortest:
+                self.letter_gap_frames = run
+        elif run < WORD_GAP_RATIO * self.letter_gap_frames:
+            self.letter_gap_frames += SMOOTHING * (run - self.letter_gap_frames)
+        if self.letter_gap_frames is not None and self.letter_gap_frames < shortest:
+            # Too short to be one; let the letter gaps that follow pull it back up.
+            self.letter_gap_frames = shortest
+
+    def _check_gap(self, output):
+        if not self.confirmed:
+            return
+        if self.letter_gap_frames is None:
+            word_gap = WORD_GAP_DOTS * self.dot_frames
+        else:
+            word_gap = WORD_GAP_RATIO * self.letter_gap_frames
+
+        if self.node != ROOT and self.run_frames > self._letter_end_frames():
+            self._end_letter(output)
+        elif not self.word_ended and self.run_frames > word_gap:
+            output.append(' ')
+            self.word_ended = True
+
+
+def letter_gap_in(elements, gaps, settle=False, ended=True):
+    """
+    Picks the letter gap length out of the runs heard so far.
+
+    Gaps longer than LETTER_GAP_DOTS fall into letter gaps and word gaps,
+    7/3 as long, however much Farnsworth spacing stretches both. The shorter
+    of two such clusters is the letter gap, as is any gap too short to be a
+    word gap. One cluster of longer gaps may be either, e.g. the word gap
+    after a one-letter word or the letter gaps of a Farnsworth word.
+
+    Keying shortens every element and lengthens every gap by about the same
+    amount, so gaps are measured in units of half a dot plus the gap after it.
+
+    Args:
+        elements (list): Element lengths in frames.
+        gaps (list): Gap lengths in frames, including one inside a letter.
+        settle (bool): No more gaps are coming, so choose even if unsure.
+        ended (bool): When settling, whether the audio ended. If not, a long
+            run of gaps all the same is taken as the letters of a long word.
+
+    Returns:
+        float: The letter gap in frames, or None if none was heard or it
+        can't be told from a word gap yet.
+    """
+    dot = min(min(elements), min(gaps))
+    long_gaps = [run for run in gaps if run > LETTER_GAP_DOTS * dot]
+    if not long_gaps:
+        return None
+    shortest = min(long_gaps)
+    if shortest < WORD_GAP_DOTS * dot or max(long_gaps) >= WORD_GAP_RATIO * shortest:
+        return shortest
+    if not settle:
+        return None
+    if not ended:
+        return shortest
+    unit = (min(elements) + min(gaps)) / 2
+    stretch = (min(gaps) - min(elements)) / 2
+    low, high = LONE_WORD_GAP_DOTS
+    if low <= (shortest - stretch) / unit <= high:
+        # Word gaps at standard spacing; the letter gap is 3 dots to their 7.
+        return stretch + (shortest - stretch) * 3 / 7
+    return shortest
+
+
+def decode_wav(path, tree, frequency=None, chunk_frames=65536):
+    """
+    Decodes a WAV file in fixed-size chunks, so memory use does not grow with its length.
+
+    Returns:
+        tuple: (text, stats) where stats holds the audio length, the time taken,
+        the speed relative to real time and the final WPM and frequency estimates.
+    """
+    started = time.perf_counter()
+    with wave.open(path, 'rb') as f:
+        if f.getsampwidth() != 2:
+            raise ValueError("only 16-bit WAV files can be decoded")
+        channels = f.getnchannels()
+        sample_rate = f.getframerate()
+        decoder = MorseDecoder(tree, sample_rate, frequency)
+        text = []
+        while True:
+            data = f.readframes(chunk_frames)
+            if not data:
+                break
+            samples = np.frombuffer(data, dtype='<i2').reshape(-1, channels)
+            text.append(decoder.feed(samples))
+        text.append(decoder.flush())
+
+    elapsed = time.perf_counter() - started
+    audio_seconds = decoder.samples_decoded / sample_rate
+    stats = {
+        "audio_seconds": audio_seconds,
+        "elapsed_seconds": elapsed,
+        "realtime_factor": audio_seconds / elapsed if elapsed > 0 else float("inf"),
+        "wpm": decoder.wpm,
+        "frequency": decoder.frequency,
+    }
+    return ''.join(text).strip(), stats
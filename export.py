@@ -0,0 +1,103 @@
+import os
+import time
+import wave
+from functools import lru_cache
+
+from render import render_text
+from synth import DEFAULT_RISE_TIME
+
+
+# === Audio File Writers ===
+class WavWriter:
+    """Streams int16 samples into a WAV file."""
+
+    def __init__(self, path, sample_rate, channels):
+        self.file = wave.open(path, "wb")
+        self.file.setnchannels(channels)
+        self.file.setsampwidth(2)
+        self.file.setframerate(sample_rate)
+
+    def write(self, buffer):
+        self.file.writeframes(buffer.tobytes())
+
+    def close(self):
+        self.file.close()
+
+
+class FlacWriter:
+    """Streams int16 samples into a FLAC file using the optional soundfile package."""
+
+    def __init__(self, path, sample_rate, channels):
+        try:
+            import soundfile
+        except ImportError:
+            print("Error: soundfile is not installed. Run: pip install soundfile")
+            exit(1)
+        self.file = soundfile.SoundFile(path, "w", samplerate=sample_rate, channels=channels,
+                                        format="FLAC", subtype="PCM_16")
+
+    def write(self, buffer):
+        self.file.write(buffer)
+
+    def close(self):
+        self.file.close()
+
+
+def open_writer(path, sample_rate, channels):
+    """Open a streaming writer for path, choosing the format from its extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".flac":
+        return FlacWriter(path, sample_rate, channels)
+    return WavWriter(path, sample_rate, channels)
+
+
+# === Export ===
+def export_audio(texts, path, code_table, frequency, timing, sample_rate=44100, channels=1, waveform="sine",
+                 rise_time=DEFAULT_RISE_TIME):
+    """
+    Renders texts straight to an audio file, one word at a time.
+
+    Only one rendered word is held in memory at once, so the length of the
+    output is limited by disk space rather than memory. Repeated words are
+    rendered once and reused.
+
+    Args:
+        texts (iterable): Words or phrases to send, each followed by a word gap.
+            May be a generator, so very long drills can be streamed.
+        path (str): Output file. A .flac extension writes FLAC, anything else WAV.
+        code_table (dict): Mapping of characters to dot-dash patterns.
+        frequency (int): Tone frequency in Hz.
+        timing (timing.Timing): Element and gap durations.
+        sample_rate (int): Output sample rate in Hz.
+        channels (int): Number of output channels.
+        waveform (str): Tone waveform, one of synth.WAVEFORMS.
+        rise_time (float): Rise and fall time of each element in seconds.
+
+    Returns:
+        dict: The number of samples written, the seconds of audio they hold,
+        the wall-clock seconds taken and the speed relative to real time.
+    """
+    @lru_cache(maxsize=1024)
+    def render_word(word):
+        return render_text(word + " ", code_table, frequency, timing, sample_rate, channels, waveform, rise_time)
+
+    started = time.perf_counter()
+    samples = 0
+    writer = open_writer(path, sample_rate, channels)
+    try:
+        for text in texts:
+            for word in text.upper().split():
+                buffer = render_word(word)
+                writer.write(buffer)
+                samples += len(buffer)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    audio_seconds = samples / sample_rate
+    return {
+        "samples": samples,
+        "audio_seconds": audio_seconds,
+        "elapsed_seconds": elapsed,
+        "realtime_factor": audio_seconds / elapsed if elapsed > 0 else float("inf"),
+    }
@@ -0,0 +1,176 @@
+import difflib
+from bisect import bisect_left
+from collections import deque
+
+# Upper edges of the response latency histogram buckets, in seconds. Anything
+# slower lands in a final overflow bucket.
+LATENCY_BUCKETS = (0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0)
+
+# Attempts that count towards rolling accuracy.
+ROLLING_WINDOW = 20
+
+
+class RollingAccuracy:
+    """Fraction correct over the last few attempts, updated in constant time."""
+    __slots__ = ("results", "correct")
+
+    def __init__(self, window):
+        self.results = deque(maxlen=window)
+        self.correct = 0
+
+    def add(self, correct):
+        if len(self.results) == self.results.maxlen:
+            self.correct -= self.results[0]
+        self.results.append(correct)
+        self.correct += correct
+
+    @property
+    def value(self):
+        return self.correct / len(self.results) if self.results else None
+
+
+class CharacterStats:
+    """Running totals, rolling accuracy and a latency histogram for one character."""
+    __slots__ = ("sent", "correct", "rolling", "latency_counts", "latency_total", "latency_samples",
+                 "mistaken_for")
+
+    def __init__(self, window=ROLLING_WINDOW):
+        self.sent = 0
+        self.correct = 0
+        self.rolling = RollingAccuracy(window)
+        self.latency_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_total = 0.0
+        self.latency_samples = 0
+        self.mistaken_for = {}
+
+    def add(self, correct, copied=None, latency=None):
+        self.sent += 1
+        self.correct += correct
+        self.rolling.add(correct)
+        if not correct and copied:
+            self.mistaken_for[copied] = self.mistaken_for.get(copied, 0) + 1
+        if latency is not None:
+            self.latency_counts[bisect_left(LATENCY_BUCKETS, latency)] += 1
+            self.latency_total += latency
+            self.latency_samples += 1
+
+    @property
+    def accuracy(self):
+        return self.correct / self.sent if self.sent else None
+
+    @property
+    def mean_latency(self):
+        return self.latency_total / self.latency_samples if self.latency_samples else None
+
+    def latency_percentile(self, fraction):
+        """Upper edge of the histogram bucket holding the given fraction of responses."""
+        if not self.latency_samples:
+            return None
+        target = fraction * self.latency_samples
+        seen = 0
+        for edge, count in zip(LATENCY_BUCKETS + (float("inf"),), self.latency_counts):
+            seen += count
+            if seen >= target:
+                return edge
+        return float("inf")
+
+
+class CopyGrader:
+    """
+    Scores typed copy against what was sent, per character.
+
+    Args:
+        window (int): Attempts that count towards rolling accuracy.
+    """
+
+    def __init__(self, window=ROLLING_WINDOW):
+        self.window = window
+        self.characters = {}
+        self.overall = RollingAccuracy(window * 5)
+        self.sent = 0
+        self.correct = 0
+        self.extra = 0
+
+    def grade(self, sent, answer, latency=None):
+        """
+        Aligns the answer with the sent text and records every character.
+
+        Missing, wrong and extra characters are found with a sequence alignment,
+        so one slip does not mark the rest of the answer wrong. Spaces are used
+        for alignment but not scored. Characters typed that were never sent
+        mark the sent character next to them wrong, so typing every candidate
+        is not scored as a correct copy.
+
+        Args:
+            sent (str): The text that was sent.
+            answer (str): What the student typed.
+            latency (float): Seconds from the end of sending to the answer, or
+                None if it should not be recorded (such as for whole sentences).
+
+        Returns:
+            list: (sent_char, copied, correct) for each character sent; copied
+            is what was typed for it, with any extra characters beside it, or
+            None where nothing was copied.
+        """
+        sent = sent.upper()
+        answer = answer.strip().upper()
+        results = []
+        # (position in results, characters typed there that were never sent)
+        inserted = []
+        matcher = difflib.SequenceMatcher(None, sent, answer, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                results.extend((char, char, True) for char in sent[i1:i2])
+            elif tag in ('replace', 'delete'):
+                copied = answer[j1:j2]
+                for k, char in enumerate(sent[i1:i2]):
+                    results.append((char, copied[k] if k < len(copied) else None, False))
+                if len(copied) > i2 - i1:
+                    inserted.append((len(results), copied[i2 - i1:]))
+            else:
+                inserted.append((len(results), answer[j1:j2]))
+
+        for position, extra in inserted:
+            extra = extra.replace(' ', '')
+            if not extra:
+                continue
+            self.extra += len(extra)
+            self._blame(results, position, extra)
+
+        for char, copied, correct in results:
+            if char == ' ':
+                continue
+            stats = self.characters.get(char)
+            if stats is None:
+                stats = self.characters[char] = CharacterStats(self.window)
+            stats.add(correct, copied, latency)
+            self.overall.add(correct)
+            self.sent += 1
+            self.correct += correct
+        return [result for result in results if result[0] != ' ']
+
+    @staticmethod
+    def _blame(results, position, extra):
+        """Mark the sent character before position wrong for extra, or the one after if it starts the text."""
+        before = [i for i in range(position) if results[i][0] != ' ']
+        after = [i for i in range(position, len(results)) if results[i][0] != ' ']
+        if before:
+            i = before[-1]
+            char, copied, _ = results[i]
+            results[i] = (char, (copied or '') + extra, False)
+        elif after:
+            i = after[0]
+            char, copied, _ = results[i]
+            results[i] = (char, extra + (copied or ''), False)
+
+    @property
+    def accuracy(self):
+        return self.correct / self.sent if self.sent else None
+
+    def summary(self):
+        """Per-character rows, weakest first: (char, sent, accuracy, rolling, median latency)."""
+        rows = []
+        for char, stats in self.characters.items():
+            rows.append((char, stats.sent, stats.accuracy, stats.rolling.value, stats.latency_percentile(0.5)))
+        rows.sort(key=lambda row: (row[2], -row[1]))
+        return rows
@@ -0,0 +1,173 @@
+import json
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import date
+
+# Attempts are written in one transaction per batch: whatever has queued up
+# within FLUSH_INTERVAL seconds, up to BATCH_SIZE rows.
+FLUSH_INTERVAL = 1.0
+BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    started REAL NOT NULL,
+    day TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    settings TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS attempts (
+    session TEXT NOT NULL,
+    time REAL NOT NULL,
+    day TEXT NOT NULL,
+    sent TEXT NOT NULL,
+    copied TEXT,
+    correct INTEGER,
+    latency REAL
+);
+CREATE INDEX IF NOT EXISTS sessions_by_day ON sessions (day);
+CREATE INDEX IF NOT EXISTS attempts_by_day ON attempts (day);
+CREATE INDEX IF NOT EXISTS attempts_by_char ON attempts (sent, day);
+"""
+
+# Sentinel that tells the writer thread to finish.
+_CLOSE = object()
+
+
+class SessionLog:
+    """
+    Append-only practice history in an SQLite database.
+
+    Sessions and attempts are put on a queue and written by a background
+    thread in batches, so logging from the playback or marker thread costs
+    one queue put. Rows are never updated or deleted. Attempts are indexed by
+    day and by character, so the stats queries only read the rows they need.
+
+    Args:
+        path (str): Database file, created if missing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        db = self._connect()
+        try:
+            db.executescript(SCHEMA)
+        finally:
+            db.close()
+        self.queue = queue.Queue()
+        self.flushed = threading.Condition()
+        self.pending = 0
+        self.thread = threading.Thread(target=self._run, name="history", daemon=True)
+        self.thread.start()
+
+    def _connect(self):
+        return sqlite3.connect(self.path)
+
+    def start_session(self, kind, settings):
+        """
+        Records the start of a drill.
+
+        Args:
+            kind (str): What is being practised, such as "week 1" or "koch".
+            settings (dict): Snapshot of the settings in effect.
+
+        Returns:
+            str: The session id to pass to record().
+        """
+        session = uuid.uuid4().hex
+        now = time.time()
+        self._put(("sessions", (session, now, date.fromtimestamp(now).isoformat(), kind,
+                                json.dumps(settings, sort_keys=True))))
+        return session
+
+    def record(self, session, sent, copied=None, correct=None, latency=None):
+        """Records one sent character, with the answer if it was copied."""
+        now = time.time()
+        self._put(("attempts", (session, now, date.fromtimestamp(now).isoformat(), sent, copied,
+                                None if correct is None else int(correct), latency)))
+
+    def _put(self, row):
+        with self.flushed:
+            self.pending += 1
+        self.queue.put(row)
+
+    def flush(self):
+        """Block until everything recorded so far is on disk."""
+        with self.flushed:
+            self.flushed.wait_for(lambda: self.pending == 0)
+
+    def close(self):
+        self.queue.put(_CLOSE)
+        self.thread.join()
+
+    def _run(self):
+        db = self._connect()
+        try:
+            while True:
+                batch = [self.queue.get()]
+                deadline = time.monotonic() + FLUSH_INTERVAL
+                while batch[-1] is not _CLOSE and len(batch) < BATCH_SIZE:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self.queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+                closing = batch[-1] is _CLOSE
+                if closing:
+                    batch.pop()
+                try:
+                    self._write(db, batch)
+                except sqlite3.Error as error:
+                    # Lose this batch rather than the thread, so flush() still returns.
+                    print(f"Warning: could not save practice history ({error}).")
+                finally:
+                    with self.flushed:
+                        self.pending -= len(batch)
+                        self.flushed.notify_all()
+                if closing:
+                    return
+        finally:
+            db.close()
+
+    def _write(self, db, batch):
+        with db:
+            for table in ("sessions", "attempts"):
+                rows = [row for name, row in batch if name == table]
+                if rows:
+                    marks = ", ".join("?" * len(rows[0]))
+                    db.executemany(f"INSERT INTO {table} VALUES ({marks})", rows)
+
+    # === Queries ===
+    def _query(self, query, params):
+        self.flush()
+        db = self._connect()
+        try:
+            return db.execute(query, params).fetchall()
+        finally:
+            db.close()
+
+    def character_stats(self, since=None):
+        """
+        Per-character totals over graded attempts.
+
+        Args:
+            since (str): First day to include, as YYYY-MM-DD, or None for all.
+
+        Returns:
+            list: (char, attempts, accuracy, mean latency) rows, weakest first.
+        """
+        query = ("SELECT sent, COUNT(*), AVG(correct), AVG(latency) FROM attempts "
+                 "WHERE correct IS NOT NULL" + (" AND day >= ?" if since else "") +
+                 " GROUP BY sent ORDER BY AVG(correct), COUNT(*) DESC")
+        return self._query(query, (since,) if since else ())
+
+    def daily_totals(self, since=None):
+        """(day, sessions, characters sent, accuracy of graded attempts) rows, oldest first."""
+        query = ("SELECT a.day, COUNT(DISTINCT a.session), COUNT(*), AVG(a.correct) FROM attempts a" +
+                 (" WHERE a.day >= ?" if since else "") + " GROUP BY a.day ORDER BY a.day")
+        return self._query(query, (since,) if since else ())
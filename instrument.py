@@ -0,0 +1,122 @@
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram bucket upper edges in seconds: powers of two from 1 microsecond to
+# about 8.4 seconds, with a final overflow bucket.
+BUCKETS = tuple(2.0 ** exponent * 1e-6 for exponent in range(24))
+
+# Spans shown on the status line, busiest first.
+STATUS_SPANS = 4
+
+enabled = False
+histograms = {}
+lock = threading.Lock()
+
+
+class Histogram:
+    """Counts of span durations in power-of-two buckets, plus count, total and max."""
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        bucket = 0
+        if seconds > BUCKETS[0]:
+            # Bucket i holds durations up to 2**i microseconds.
+            bucket = min(len(BUCKETS), int(seconds / BUCKETS[0] - 1e-9).bit_length())
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, fraction):
+        """Upper edge of the bucket holding the given fraction of spans."""
+        target = fraction * self.count
+        seen = 0
+        for edge, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= target:
+                return edge
+        return self.max
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "mean_ms": self.total * 1000 / self.count if self.count else None,
+            "p50_ms": self.percentile(0.5) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+            "max_ms": self.max * 1000,
+            "buckets_us": {f"{edge * 1e6:g}": count for edge, count in zip(BUCKETS, self.counts) if count},
+        }
+
+
+def set_enabled(value):
+    global enabled
+    enabled = bool(value)
+
+
+def record(name, seconds):
+    with lock:
+        histogram = histograms.get(name)
+        if histogram is None:
+            histogram = histograms[name] = Histogram()
+        histogram.add(seconds)
+
+
+@contextmanager
+def span(name):
+    """Time a with block under name. Costs one flag check when instrumentation is off."""
+    if not enabled:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def timed(name):
+    """Decorator form of span, cheaper than a with block on hot paths."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+
+def reset():
+    with lock:
+        histograms.clear()
+
+
+def status_line():
+    """One line with the median and 99th percentile of the busiest spans."""
+    with lock:
+        busiest = sorted(histograms.items(), key=lambda item: item[1].total, reverse=True)[:STATUS_SPANS]
+        parts = [f"{name} {h.percentile(0.5) * 1000:.3g}/{h.percentile(0.99) * 1000:.3g} ms (n={h.count})"
+                 for name, h in busiest]
+    return "Timing p50/p99: " + (" | ".join(parts) if parts else "nothing timed yet")
+
+
+def dump(path):
+    """Write every histogram to a JSON file."""
+    with lock:
+        data = {name: histogram.as_dict() for name, histogram in sorted(histograms.items())}
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
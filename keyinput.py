@@ -0,0 +1,160 @@
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Events posted by the listener.
+ENTER = 'enter'
+QUIT = 'quit'
+
+# How often the listener thread checks for input and for a stop request.
+# Gap timing does not depend on this; waits end on their own deadline.
+POLL_INTERVAL = 0.05
+
+
+class KeyListener:
+    """
+    Reads the keyboard on a background thread and posts events to a queue.
+
+    Pressing Enter posts ENTER and typing q (then Enter on POSIX) posts QUIT.
+    Any other line typed on POSIX is kept in typed instead, so Copy Mode can
+    take what was copied while the code was still sounding. The thread only
+    consumes input while listening, so menus can go on using input() in
+    between drills.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdin
+        self.events = queue.Queue()
+        self.typed = []
+        self.stop_requested = threading.Event()
+        self.thread = None
+        self.depth = 0
+        self.read_key = self._select_reader() or self._msvcrt_reader()
+        self.supported = self.read_key is not None
+
+    @contextmanager
+    def listening(self):
+        """Listen for keys for the duration of a with block. Blocks may nest."""
+        self.depth += 1
+        if self.depth == 1:
+            self.start()
+        try:
+            yield self
+        finally:
+            self.depth -= 1
+            if self.depth == 0:
+                self.stop()
+
+    @contextmanager
+    def suspended(self):
+        """Hand the keyboard back to input() for the duration of a with block."""
+        running = self.thread is not None
+        self.stop()
+        try:
+            yield
+        finally:
+            if running:
+                self.start()
+
+    def start(self):
+        if not self.supported or self.thread is not None:
+            return
+        self.clear()
+        self.stop_requested.clear()
+        self.thread = threading.Thread(target=self._run, name="keyinput", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.stop_requested.set()
+        self.thread.join()
+        self.thread = None
+
+    def clear(self):
+        self.typed = []
+        while True:
+            try:
+                self.events.get_nowait()
+            except queue.Empty:
+                return
+
+    def wait(self, seconds):
+        """
+        Waits until a deadline on the monotonic clock, or until a key arrives.
+
+        Returns:
+            str: None if the deadline passed, otherwise ENTER or QUIT.
+        """
+        deadline = time.monotonic() + seconds
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                return self.events.get(timeout=remaining)
+            except queue.Empty:
+                return None
+
+    def next_event(self):
+        """Block until the next key event."""
+        return self.events.get()
+
+    def take_typed(self):
+        """The lines typed since listening started, other than q; they are forgotten."""
+        typed, self.typed = self.typed, []
+        return typed
+
+    def _run(self):
+        while not self.stop_requested.is_set():
+            try:
+                event = self.read_key()
+            except (OSError, ValueError):
+                return
+            if event == 'eof':
+                return
+            if event is not None:
+                self.events.put(event)
+
+    def _select_reader(self):
+        try:
+            import select
+            self.stream.fileno()
+            select.select([self.stream], [], [], 0)
+        except Exception:
+            return None
+
+        def read_key():
+            if not select.select([self.stream], [], [], POLL_INTERVAL)[0]:
+                return None
+            line = self.stream.readline()
+            if not line:
+                return 'eof'
+            text = line.strip()
+            if text.lower() == 'q':
+                return QUIT
+            if text:
+                self.typed.append(text)
+                return None
+            return ENTER
+        return read_key
+
+    def _msvcrt_reader(self):
+        try:
+            import msvcrt  # Windows
+        except ImportError:
+            return None
+
+        def read_key():
+            if not msvcrt.kbhit():
+                time.sleep(0.005)
+                return None
+            key = msvcrt.getch()
+            if key == b'\r':
+                return ENTER
+            elif key in (b'q', b'Q'):
+                return QUIT
+            return None
+        return read_key
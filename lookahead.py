@@ -0,0 +1,183 @@
+import queue
+import threading
+import time
+from dataclasses import dataclass
+
+import instrument
+
+# How many prepared characters may wait ahead of the one playing.
+DEFAULT_DEPTH = 8
+
+# How often a producer blocked on a full queue checks for close().
+POLL_INTERVAL = 0.05
+
+# Put on the queue once the characters run out.
+_END = object()
+
+
+@dataclass
+class PreparedChar:
+    """
+    One character ready to send.
+
+    Attributes:
+        char (str): The character, or ' ' for a word space.
+        buffer: Its rendered int16 audio, gaps included.
+        sound: The buffer prepared for the audio backend, or None for a word space.
+        seconds (float): How long it lasts, gaps included.
+        card (str): Text to show as it starts; empty to show nothing.
+        speech (bytes): Synthesized speech to say after it, or None.
+    """
+    char: str
+    buffer: object
+    sound: object
+    seconds: float
+    card: str = None
+    speech: bytes = None
+
+
+class LookAhead:
+    """
+    Prepares characters on a background thread while earlier ones play.
+
+    A producer thread pulls characters, turns each one into a PreparedChar
+    and puts it on a bounded queue, blocking once depth characters are
+    waiting. Choosing, rendering, drawing and speech synthesis all happen
+    there, so the player only ever takes finished entries off the queue.
+
+    How long each character took to prepare, how full the queue was when the
+    player took from it and every time the player found it empty (a
+    starvation) are kept in stats(), and go into the instrument histograms
+    as lookahead_prepare and lookahead_starved when instrumentation is on.
+
+    Iterating yields prepared characters until the characters run out.
+    Use it as a context manager, or call start() and close().
+
+    Args:
+        chars (iterable): Characters to prepare; may be an endless generator.
+        prepare (callable): Turns one character into a PreparedChar. Called
+            from the producer thread.
+        depth (int): How many prepared characters may wait in the queue.
+    """
+
+    def __init__(self, chars, prepare, depth=DEFAULT_DEPTH):
+        self.chars = chars
+        self.prepare = prepare
+        self.depth = depth
+        self.queue = queue.Queue(maxsize=depth)
+        self.stopped = threading.Event()
+        self.error = None
+        self.prepared = 0
+        self.taken = 0
+        self.prepare_seconds = 0.0
+        self.max_prepare_seconds = 0.0
+        self.depth_total = 0
+        self.min_depth = None
+        self.starved = 0
+        self.starved_seconds = 0.0
+        self.thread = threading.Thread(target=self._produce, name="lookahead", daemon=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        while True:
+            entry = self.get()
+            if entry is None:
+                return
+            yield entry
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join()
+        try:
+            # Wake anyone still waiting in get(); nothing more is coming.
+            self.queue.put_nowait(_END)
+        except queue.Full:
+            pass
+
+    def get(self):
+        """The next prepared character, waiting if none is ready; None once they run out."""
+        depth = self.queue.qsize()
+        try:
+            entry = self.queue.get_nowait()
+        except queue.Empty:
+            started = time.perf_counter()
+            entry = self.queue.get()
+            if entry is not _END:
+                waited = time.perf_counter() - started
+                self.starved += 1
+                self.starved_seconds += waited
+                if instrument.enabled:
+                    instrument.record("lookahead_starved", waited)
+
+        if entry is _END:
+            # Leave the marker for anyone else still reading.
+            self.queue.put(_END)
+            if self.error is not None:
+                raise self.error
+            return None
+        self.taken += 1
+        self.depth_total += depth
+        self.min_depth = depth if self.min_depth is None else min(self.min_depth, depth)
+        return entry
+
+    def stats(self):
+        return {
+            "depth": self.depth,
+            "queued": self.queue.qsize(),
+            "prepared": self.prepared,
+            "taken": self.taken,
+            "mean_depth": self.depth_total / self.taken if self.taken else None,
+            "min_depth": self.min_depth,
+            "mean_prepare_ms": self.prepare_seconds * 1000 / self.prepared if self.prepared else None,
+            "max_prepare_ms": self.max_prepare_seconds * 1000,
+            "starved": self.starved,
+            "starved_ms": self.starved_seconds * 1000,
+        }
+
+    def status_line(self):
+        stats = self.stats()
+        mean_depth = f"{stats['mean_depth']:.1f}" if self.taken else "-"
+        mean_prepare = f"{stats['mean_prepare_ms']:.3g}" if self.prepared else "-"
+        return (f"Look-ahead: depth {mean_depth}/{self.depth} (min {stats['min_depth']}), "
+                f"prepare {mean_prepare}/{stats['max_prepare_ms']:.3g} ms mean/max, "
+                f"starved {self.starved} times ({stats['starved_ms']:.0f} ms)")
+
+    def _produce(self):
+        try:
+            for char in self.chars:
+                if self.stopped.is_set():
+                    return
+                started = time.perf_counter()
+                entry = self.prepare(char)
+                seconds = time.perf_counter() - started
+                self.prepared += 1
+                self.prepare_seconds += seconds
+                self.max_prepare_seconds = max(self.max_prepare_seconds, seconds)
+                if instrument.enabled:
+                    instrument.record("lookahead_prepare", seconds)
+                if not self._put(entry):
+                    return
+        except Exception as e:
+            # Raised again in the player, which can report it.
+            self.error = e
+        finally:
+            self._put(_END)
+
+    def _put(self, item):
+        """Put item on the queue, waiting for room. Returns False once closed."""
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=POLL_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
@@ -0,0 +1,58 @@
+ROOT = 1
+DEAD = 0
+
+
+class MorseTree:
+    """
+    Dot-dash patterns to characters, as a binary tree stored in flat lists.
+
+    Node n's dot child is 2n and its dash child 2n + 1, starting from ROOT, so
+    following a pattern is a shift and an add per symbol with no dictionary
+    lookups. Sequences that lead nowhere end up at DEAD. Each node also holds
+    every character whose pattern starts with the path to it, so prefix
+    queries are a single index.
+
+    Args:
+        code_table (dict): Mapping of characters to dot-dash patterns.
+    """
+
+    def __init__(self, code_table):
+        depth = max(len(pattern) for pattern in code_table.values())
+        self.size = 2 << depth
+        self.chars = [None] * self.size
+        completions = [[] for _ in range(self.size)]
+        for char, pattern in code_table.items():
+            node = ROOT
+            completions[node].append(char)
+            for symbol in pattern:
+                node = 2 * node + (symbol == '-')
+                completions[node].append(char)
+            self.chars[node] = char
+        self.completions_at = [''.join(chars) for chars in completions]
+        self.completions_at[DEAD] = ''
+
+    def step(self, node, symbol):
+        """Follow one '.' or '-' from node. Returns DEAD once no character can match."""
+        node = 2 * node + (symbol == '-')
+        if node >= self.size or not self.completions_at[node]:
+            return DEAD
+        return node
+
+    def walk(self, pattern, node=ROOT):
+        for symbol in pattern:
+            if node == DEAD:
+                break
+            node = self.step(node, symbol)
+        return node
+
+    def char_at(self, node):
+        """The character whose pattern ends exactly at node, or None."""
+        return self.chars[node]
+
+    def lookup(self, pattern):
+        """The character for a complete pattern, or None."""
+        return self.chars[self.walk(pattern)]
+
+    def completions(self, pattern):
+        """Every character whose pattern starts with the given prefix."""
+        return self.completions_at[self.walk(pattern)]
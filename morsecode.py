@@ -1,81 +1,174 @@
+import time
+_import_started = time.perf_counter()
+
+import argparse
+import io
 import json
 import os
-import platform
 import random
-import shutil
-import subprocess
 import signal
+import sys
+import wave
+from collections import OrderedDict
+from dataclasses import fields
+from itertools import islice
 
-from ascii_letters import ascii_letter
+from adaptive import LetterWeights
+from ascii_letters import ascii_letter, ascii_text
+from content import ContentGenerator, WordPool
+import instrument
+from grading import CopyGrader
+from instrument import span, timed
+from keyinput import ENTER, QUIT, KeyListener
+from morse_tree import MorseTree
+from settings import Settings, SettingsStore, env_overrides
+from timing import element_durations
 
 SETTINGS_FILE = "morse_settings.json"
+WEIGHTS_FILE = "morse_weights.json"
+HISTORY_FILE = "morse_history.db"
+# The benchmark turns this off so its runs don't count as practice.
+history_enabled = True
+TIMINGS_FILE = "morse_timings.json"
+# Where the wav audio backend writes, unless --audio-file says otherwise.
+audio_file = "morse_output.wav"
 
 # === 3rd Party Modules ===
-try:
-    import pygame
-except ImportError:
-    print("Error: Pygame is not installed. Run: pip install pygame")
-    exit(1)
+# pygame, numpy and pyttsx3 are slow to import, so they are loaded on first use
+# and the menu comes up straight away. Their load times go into startup_timings.
+audio = None
+corpus = None
+speech_worker = None
+session_log = None
+current_session = None
+scheduler = None
+stream_stats = None
+startup_timings = {}
 
-try:
-    import numpy as np
-except ImportError:
-    print("Error: NumPy is not installed. Run: pip install numpy")
-    exit(1)
+def timed_startup_step(name, func):
+    started = time.perf_counter()
+    result = func()
+    startup_timings[name] = time.perf_counter() - started
+    return result
 
-try:
-    import pyttsx3
-except ImportError:
-    print("Error: pyttsx3 is not installed. Run: pip install pyttsx3")
-    exit(1)
+def import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        print("Error: NumPy is not installed. Run: pip install numpy")
+        exit(1)
+    return numpy
 
+def import_pygame():
+    try:
+        import pygame
+    except ImportError:
+        print("Error: Pygame is not installed. Run: pip install pygame")
+        exit(1)
+    return pygame
 
-# === Settings File Functions ===
-def load_settings():
-    default_settings = {
-        "current_frequency": 700,
-        "current_wpm": 10,
-        "show_morse": True,
-        "flash_card_mode_enabled": False,
-        "voice_enabled": False
-    }
-    if os.path.exists(SETTINGS_FILE):
-        with open(SETTINGS_FILE, 'r') as f:
-            settings = json.load(f)
-        for k, v in default_settings.items():
-            if k not in settings:
-                settings[k] = v
-        return settings
+def init_audio():
+    """Bring up the audio backend the first time something is played."""
+    global audio
+    if audio is not None:
+        return
+    timed_startup_step("numpy import", import_numpy)
+    from audio import NullBackend, PygameBackend, WavFileBackend
+
+    if audio_backend == "null":
+        audio = NullBackend()
+    elif audio_backend == "wav":
+        audio = WavFileBackend(audio_file)
     else:
-        with open(SETTINGS_FILE, 'w') as f:
-            json.dump(default_settings, f, indent=2)
-        return default_settings
+        timed_startup_step("pygame import", import_pygame)
+        audio = timed_startup_step("mixer init", PygameBackend)
 
+# === Settings File Functions ===
 def save_settings():
-    settings = {
+    """Hand the current settings to the store, which writes them shortly afterwards."""
+    settings_store.update(**current_settings())
+
+def current_settings():
+    return {
         "current_frequency": current_frequency,
         "current_wpm": current_wpm,
+        "farnsworth_wpm": farnsworth_wpm,
+        "waveform": waveform,
+        "rise_time_ms": rise_time_ms,
         "show_morse": show_morse,
         "flash_card_mode_enabled": flash_card_mode_enabled,
-        "voice_enabled": voice_enabled
+        "voice_enabled": voice_enabled,
+        "copy_mode_enabled": copy_mode_enabled,
+        "audio_backend": audio_backend,
+        "corpus_file": corpus_file,
+        "instrumentation_enabled": instrumentation_enabled
     }
-    with open(SETTINGS_FILE, 'w') as f:
-        json.dump(settings, f, indent=2)
 
-# === Initialize Pygame ===
-pygame.init()
-pygame.mixer.init(frequency=44100, size=-16, channels=2)
+def apply_settings(settings) -> None:
+    global current_frequency, current_wpm, farnsworth_wpm, waveform, rise_time_ms, show_morse
+    global flash_card_mode_enabled, voice_enabled, copy_mode_enabled, audio_backend, corpus_file
+    global instrumentation_enabled
+    current_frequency = settings.current_frequency
+    current_wpm = settings.current_wpm
+    farnsworth_wpm = settings.farnsworth_wpm
+    waveform = settings.waveform
+    rise_time_ms = settings.rise_time_ms
+    show_morse = settings.show_morse
+    flash_card_mode_enabled = settings.flash_card_mode_enabled
+    voice_enabled = settings.voice_enabled
+    copy_mode_enabled = settings.copy_mode_enabled
+    audio_backend = settings.audio_backend
+    corpus_file = settings.corpus_file
+    instrumentation_enabled = settings.instrumentation_enabled
+    instrument.set_enabled(instrumentation_enabled)
 
 # === Load Settings ===
-settings = load_settings()
-current_frequency = settings["current_frequency"]
-current_wpm = settings["current_wpm"]
-show_morse = settings["show_morse"]
-flash_card_mode_enabled = settings["flash_card_mode_enabled"]
-voice_enabled = settings["voice_enabled"]
-dot_duration = 60.0 / (current_wpm * 50.0)
-timeout_supported = True
-engine = None
+def build_settings_parser():
+    """The command-line options that change settings. build_arg_parser includes them too."""
+    parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+    parser.add_argument("--set", action="append", default=[], metavar="SETTING=VALUE",
+                        help="override a setting for this run only, e.g. --set current_wpm=20")
+    parser.add_argument("--no-save", action="store_true", help="never write the settings file")
+    parser.add_argument("--corpus", metavar="FILE",
+                        help="word or phrase list (one per line) for the word and sentence menus")
+    parser.add_argument("--audio", choices=["pygame", "wav", "null"],
+                        help="play through pygame, write to --audio-file, or play nothing (for testing)")
+    return parser
+
+def settings_overrides(args):
+    """Overrides from --set, --audio and --corpus. Returns (overrides, --set items that aren't SETTING=VALUE)."""
+    items = list(args.set)
+    if args.audio:
+        items.append(f"audio_backend={args.audio}")
+    if args.corpus:
+        items.append(f"corpus_file={args.corpus}")
+    overrides = {}
+    bad_items = []
+    for item in items:
+        name, separator, value = item.partition("=")
+        if separator and name.strip() in SETTING_NAMES:
+            overrides[name.strip()] = value.strip()
+        else:
+            bad_items.append(item)
+    return overrides, bad_items
+
+# The options that change settings are read before the file is, so a --no-save
+# run never touches it and everything built from the settings, such as the
+# export defaults, sees the overrides. MORSE_<SETTING> environment variables
+# override the file too, and MORSE_NO_SAVE=1 works like --no-save.
+SETTING_NAMES = {field.name for field in fields(Settings)}
+startup_args, _ = build_settings_parser().parse_known_args(None if __name__ == "__main__" else [])
+startup_overrides, bad_overrides = settings_overrides(startup_args)
+settings_store = timed_startup_step("settings load", lambda: SettingsStore(
+    SETTINGS_FILE, save=not (startup_args.no_save or os.environ.get("MORSE_NO_SAVE"))))
+for problem in settings_store.override({**env_overrides(), **startup_overrides}):
+    print(f"Warning: {problem}")
+apply_settings(settings_store.settings)
+timing = element_durations(current_wpm, farnsworth_wpm)
+dot_duration = timing.dot
+key_listener = KeyListener()
+timeout_supported = key_listener.supported
+copy_grader = CopyGrader()
 
 # === Morse Code Letters, Words, Sentences, etc. ===
 morse_code = {
@@ -88,6 +181,9 @@ morse_code = {
     '.': '.-.-.-', ',': '--..--', '?': '..--..', '/': '-..-.'
 }
 
+# Pattern to character index, shared by everything that reads Morse code back.
+morse_tree = MorseTree(morse_code)
+
 week_letters = {
     1: 'ETIANM',
     2: 'SURWDK',
@@ -100,6 +196,10 @@ week_letters = {
     9: '.,?/'
 }
 
+# Weeks 1-6 in order, which is also the order the Koch method adds characters.
+koch_order = "".join(dict.fromkeys("".join(week_letters[week] for week in range(1, 7))))
+letter_weights = timed_startup_step("weights load", lambda: LetterWeights.load(koch_order, WEIGHTS_FILE))
+
 additional_characters = {
     1: "",
     2: "",
@@ -127,190 +227,306 @@ week7_sentences = ["THE QUICK BROWN FOX JUMPS OVER LAZY DOG.", "PACK MY BOX WITH
 
 all_words = week1_words + week12_words + week123_words + week1234_words
 
-call_signs = ["WA7SPY/QRP", "KB1FJZ", "N8FIT", "KA2UTL", "W4ZX", "N3BKQ", "WA5PRY/M", "N6OQN", "W8GSH"]
+# Generated call signs, made-up words and number groups. --seed makes a run repeatable.
+content = ContentGenerator()
+word_pool = WordPool(all_words + week7_words)
+
+def letters_through_week(week) -> str:
+    """Every letter taught up to and including the given week."""
+    return "".join(dict.fromkeys("".join(week_letters[w] for w in range(1, min(week, 7) + 1))))
 
 # === Utility Functions ===
-def prompt_for_pause(duration_seconds=3.0) -> str:
-    """Wait for specified duration, but allow Enter to pause"""
-    global timeout_supported
-    # If timeout is not supported, just wait for the duration.
-    if timeout_supported != True:
-        pygame.time.wait(int(duration_seconds * 1000))
-        return 'continue'
+def pause_audio():
+    if audio is not None:
+        audio.pause()
 
-    # If timeout is supported, wait for input with specified timeout.
-    try:
-        import select
-        import sys
-
-        # Wait for input with specified timeout
-        if select.select([sys.stdin], [], [], duration_seconds)[0]:
-            user_input = input().strip().lower()
-            if user_input == 'q':
-                return 'quit'
-            elif user_input == "":
-                print_blue("PAUSED - Press Enter to continue, or type 'q' to quit...")
-                user_input = input().strip().lower()
-                if user_input == 'q':
-                    return 'quit'
-                else:
-                    print_blue("RESUMED")
-                    return 'continue'
-        else:
-            # Timeout occurred, continue automatically
-            return 'continue'
-    except:
-        # Fallback for systems where select doesn't work
-        try:
-            import msvcrt  # Windows
-            import time
-
-            start_time = time.time()
-            while time.time() - start_time < duration_seconds:
-                if msvcrt.kbhit():
-                    key = msvcrt.getch()
-                    if key == b'\r':  # Enter key
-                        print_blue("PAUSED - Press Enter to continue, or type 'q' to quit...")
-                        user_input = input().strip().lower()
-                        if user_input == 'q':
-                            return 'quit'
-                        else:
-                            print_blue("RESUMED")
-                            return 'continue'
-                    elif key == b'q':
-                        return 'quit'
-                time.sleep(0.1)
-
-            # Timeout occurred, continue automatically
-            return 'continue'
-        except:
-            # If we try to use timeout and it fails, don't try again.
-            timeout_supported = False
-            print_blue("Press Enter to continue, or type 'q' to quit...")
-            user_input = input().strip().lower()
-            if user_input == 'q':
-                return 'quit'
-            return 'continue'
+def resume_audio():
+    if audio is not None:
+        audio.resume()
+
+def blue(text):
+    return f"\033[97m{text}\033[0m"
 
 def print_blue(text):
-    print(f"\033[97m{text}\033[0m")
+    print(blue(text))
 
 # === Morse Code Sounds ===
-def generate_tone(frequency, duration, sample_rate=44100):
-    t = np.linspace(0, duration, int(sample_rate * duration), endpoint=False)
-    waveform = (np.sin(2 * np.pi * frequency * t) * 32767).astype(np.int16)
-    return np.column_stack((waveform, waveform))
+# === Tone Cache ===
+# Rendered characters, as (buffer, sound) pairs, keyed by (character,
+# frequency, timing, tone shape, audio format). The sound is the buffer
+# prepared for the backend. A change of frequency, WPM or tone produces a new
+# key, so stale tones are never played and the least recently used entries fall
+# out once the cache is full.
+TONE_CACHE_SIZE = 64
+tone_cache = OrderedDict()
+tone_cache_hits = 0
+tone_cache_misses = 0
 
-def play_morse(letter) -> str:
-    if letter == ' ':
-        result = prompt_for_pause(dot_duration * 7)
-        if result == 'quit':
-            return 'quit'
-        return 'continue'
+def get_rendered_letter(letter):
+    """Return the pre-rendered (buffer, sound) for a character, gaps included."""
+    global tone_cache_hits, tone_cache_misses
+    init_audio()
+    key = (letter, current_frequency, timing, waveform, rise_time_ms, audio.format)
+    rendered = tone_cache.get(key)
+    if rendered is not None:
+        tone_cache.move_to_end(key)
+        tone_cache_hits += 1
+        return rendered
 
-    for symbol in morse_code.get(letter, ''):
-        duration = dot_duration if symbol == '.' else dot_duration * 3
-        tone = generate_tone(current_frequency, duration)
-        sound = pygame.sndarray.make_sound(tone)
-        sound.play()
-        
-        # Wait for tone duration
-        result = prompt_for_pause(duration)
-        if result == 'quit':
-            return 'quit'
-        
-        # Wait for element spacing
-        result = prompt_for_pause(dot_duration)
-        if result == 'quit':
-            return 'quit'
-    
-    # Wait for letter spacing
-    result = prompt_for_pause(dot_duration * 3)
-    if result == 'quit':
-        return 'quit'
-    
-    return 'continue'
+    tone_cache_misses += 1
+    from render import render_text, render_timeline
+    with span("render_text"):
+        if letter == ' ':
+            # A word space adds the rest of a word gap to the letter gap the previous character ended with.
+            buffer = render_timeline([(False, timing.word_gap - timing.letter_gap)], current_frequency,
+                                     audio.sample_rate, audio.channels)
+        else:
+            buffer = render_text(letter, morse_code, current_frequency, timing, audio.sample_rate,
+                                 audio.channels, waveform, rise_time_ms / 1000.0)
+    with span("make_sound"):
+        rendered = (buffer, audio.prepare(buffer))
+    tone_cache[key] = rendered
+    if len(tone_cache) > TONE_CACHE_SIZE:
+        tone_cache.popitem(last=False)
+    return rendered
+
+def tone_cache_stats():
+    return {"size": len(tone_cache), "hits": tone_cache_hits, "misses": tone_cache_misses}
+
+def tone_cache_status_line():
+    stats = tone_cache_stats()
+    return f"Tone cache: {stats['size']}/{TONE_CACHE_SIZE} entries, {stats['hits']} hits, {stats['misses']} misses"
+
+# === Session History ===
+def get_session_log():
+    """Open the history database the first time a drill starts."""
+    global session_log
+    if session_log is None:
+        from history import SessionLog
+        session_log = timed_startup_step("history open", lambda: SessionLog(HISTORY_FILE))
+    return session_log
+
+def begin_session(kind) -> None:
+    global current_session
+    if not history_enabled:
+        current_session = None
+        return
+    current_session = get_session_log().start_session(kind, current_settings())
+
+def log_sent(char, copied=None, correct=None, latency=None) -> None:
+    """Log one sent character. Safe to call from the audio marker thread."""
+    if current_session is not None:
+        session_log.record(current_session, char, copied, correct, latency)
 
 # === Voice ===
+def get_speech_worker():
+    """Start the background speech worker the first time Voice Mode speaks."""
+    global speech_worker
+    if speech_worker is None:
+        from voice import SpeechWorker, default_backend
+        speech_worker = timed_startup_step("speech init", lambda: SpeechWorker(default_backend(), play_wav))
+    return speech_worker
+
+@timed("play_wav")
+def play_wav(wav):
+    """Play synthesized speech. Called from the speech worker thread."""
+    init_audio()
+    audio.play_wav(wav)
+
+@timed("speak_text")
 def speak_text(text) -> None:
-    system = platform.system()
-    
-    if system == "Darwin":  # macOS
-          # Use lowercase to avoid "capital" being spoken
-        os.system(f"say '{text.lower()}'")
-    elif system == "Linux":
-        if shutil.which("espeak"):
-            subprocess.run(["espeak", text])
-    elif system == "Windows":
-        global engine
-        if engine:
-            try:
-                engine.say(text)
-                engine.runAndWait()
-                engine.stop()
-            except Exception as e:
-                print(f"[DEBUG] pyttsx3 failed: {e}")
+    # Returns at once; the worker speaks while the next character is prepared.
+    get_speech_worker().say(text)
+
+def cancel_speech():
+    if speech_worker is not None:
+        speech_worker.cancel()
 
 # === Play Letter ===
-def play_letter(letter) -> str:
+def letter_card(letter) -> str:
+    """The text shown as a character is sent; empty in Copy Mode."""
+    if copy_mode_enabled:
+        # Don't give the answer away before it has been copied.
+        return ""
     if letter == ' ':
-        print("Space (between words)")
-        return prompt_for_pause(dot_duration * 7)
-
+        return "Space (between words)"
     if flash_card_mode_enabled:
-        print("\n\n")
-        print_blue(ascii_letter(letter))
+        with span("ascii_letter"):
+            art = ascii_letter(letter)
+        return blue("\n\n\n" + art)
     elif show_morse:
-        print_blue(f"Sending: {letter} ({morse_code[letter]})")
-    else:
-        print_blue(f"Sending: {letter}")
+        return blue(f"Sending: {letter} ({morse_code[letter]})")
+    return blue(f"Sending: {letter}")
 
-    # Play the morse code for the letter
-    result = play_morse(letter)
-    if result == 'quit':
-        return 'quit'
+def word_cards(text) -> str:
+    """Flash cards for text, each word's characters side by side in one block."""
+    with span("ascii_text"):
+        art = "\n\n".join(ascii_text(word) for word in text.upper().split())
+    return blue("\n" + art)
 
-    # Speak the letter
-    if voice_enabled:
-        # Wait so the user can write their guess.
-        result = prompt_for_pause(dot_duration * 6)
-        if result == 'quit':
-            return 'quit'
-        speak_text(letter)
+def show_letter(letter, card=None) -> None:
+    """Show a character as it starts sounding, drawing its card unless it was drawn ahead."""
+    if letter != ' ' and not copy_mode_enabled:
+        # In Copy Mode it is logged once graded.
+        log_sent(letter)
+    if card is None:
+        card = letter_card(letter)
+    if card:
+        print(card)
+
+def show_prepared(entry) -> None:
+    show_letter(entry.char, entry.card)
+
+# === Scheduler ===
+def get_scheduler():
+    """Create the playback scheduler the first time something is sent."""
+    global scheduler
+    if scheduler is None:
+        from scheduler import PlaybackScheduler
+        scheduler = PlaybackScheduler(key_listener, on_pause=pause_sending, on_resume=resume_sending,
+                                      on_quit=stop_sending)
+    return scheduler
+
+def pause_sending():
+    print_blue("PAUSED - Press Enter to continue, or type 'q' to quit...")
+    pause_audio()
+
+def resume_sending():
+    resume_audio()
+    print_blue("RESUMED")
+
+def stop_sending():
+    resume_audio()
+    audio.stop()
+    cancel_speech()
+
+def speech_busy():
+    return speech_worker is not None and speech_worker.busy()
+
+def letter_sound_and_length(letter):
+    if letter == ' ':
+        # The previous character already ended with a letter gap.
+        return None, timing.word_gap - timing.letter_gap
+    buffer, sound = get_rendered_letter(letter)
+    return sound, len(buffer) / audio.sample_rate
+
+def send_chars(chars, show=True) -> str:
+    """Send characters as a scheduler job, with Voice Mode and the pause and quit keys."""
+    return run_send_job(chars, letter_sound_and_length, show_letter if show else None,
+                        speak_text if voice_enabled else None)
+
+def send_prepared(entries) -> str:
+    """Send characters prepared ahead by a LookAhead, as send_chars does."""
+    return run_send_job(entries, lambda entry: (entry.sound, entry.seconds), show_prepared,
+                        (lambda entry: speak_text(entry.char)) if voice_enabled else None)
 
-    # Space between letters
-    return prompt_for_pause(int(dot_duration * 3))
+def run_send_job(items, sound_for, show, speak) -> str:
+    from scheduler import SendJob
+
+    init_audio()
+    job = SendJob(items, timing, sound_for, audio.play, show, speak, speech_busy)
+    with key_listener.listening():
+        return get_scheduler().run(job)
 
 # === Morse Features ===
 def play_text(text) -> str:
-    for char in text.upper():
-        if char in morse_code or char == ' ':
-            result = play_letter(char)
-            if result == 'quit':
-                return 'quit'
-    return 'continue'
-
-def practice_week_letters_continuously(week_num) -> str:
-    letters = week_letters[week_num]
+    return send_chars(char for char in text.upper() if char in morse_code or char == ' ')
 
+def week_letter_chars(letters):
+    """Endless characters for a drill: random letters, weighted by letter_weights, a space after every 5."""
     i = 0
     while True:
-        letter = random.choice(letters)
+        letter = letter_weights.choose(letters)
         if letter == ' ':
             continue
-
-        # After 5 letters, play a space.
         if i >= 5:
-            result = play_letter(' ')
-            if result == 'quit':
-                break
+            yield ' '
             i = 0
-
-        result = play_letter(letter)
-        if result == 'quit':
-            break
+        yield letter
         i += 1
 
+# === Look-ahead ===
+# Drills prepare this many characters ahead of the one playing.
+LOOKAHEAD_DEPTH = 8
+
+def prepare_char(char):
+    """Render, draw and, in Voice Mode, synthesize one character. Runs on the look-ahead thread."""
+    from lookahead import PreparedChar
+
+    buffer, sound = get_rendered_letter(char)
+    seconds = len(buffer) / audio.sample_rate
+    if char == ' ':
+        # Spaces are silence on the scheduler's timeline; only streams play their buffer.
+        return PreparedChar(char, buffer, None, seconds, letter_card(char))
+    speech = get_speech_worker().prepare(char) if voice_enabled else None
+    return PreparedChar(char, buffer, sound, seconds, letter_card(char), speech)
+
+def week_letter_lookahead(letters):
+    """A LookAhead preparing week_letter_chars for a drill; use it in a with block."""
+    from lookahead import LookAhead
+
+    init_audio()
+    if voice_enabled:
+        # Start the speech worker here rather than racing to do it from both threads.
+        get_speech_worker()
+    return LookAhead(week_letter_chars(letters), prepare_char, LOOKAHEAD_DEPTH)
+
+def play_stream(items, show=show_letter) -> str:
+    """
+    Stream (label, buffer) pairs until they run out, showing each label as it sounds.
+
+    The stream's stats() are left in stream_stats when it stops.
+    """
+    from stream import AudioStream
+
+    global stream_stats
+    init_audio()
+    stream = AudioStream(items, audio.stream_output(), audio.sample_rate, audio.channels,
+                         on_marker=show).start()
+    try:
+        with key_listener.listening():
+            while not stream.finished.is_set():
+                event = key_listener.wait(0.05)
+                if event == QUIT:
+                    return 'quit'
+                elif event == ENTER:
+                    print_blue("PAUSED - Press Enter to continue, or type 'q' to quit...")
+                    stream.pause()
+                    event = key_listener.next_event()
+                    if event == QUIT:
+                        return 'quit'
+                    stream.resume()
+                    print_blue("RESUMED")
+        return 'continue'
+    finally:
+        stream.stop()
+        stream_stats = stream.stats()
+
+def stream_status_line():
+    stats = stream_stats
+    return (f"Stream: {stats['blocks_played']} blocks ({stats['frames_played'] / audio.sample_rate:.1f} s), "
+            f"{stats['underruns']} underruns, producer waited {stats['producer_waits']} times")
+
+def practice_week_letters_continuously(week_num) -> str:
+    letters = week_letters[week_num]
+    begin_session(f"week {week_num}")
+
+    if copy_mode_enabled:
+        return copy_week_letters(letters)
+
+    # Characters are chosen and rendered ahead on the look-ahead thread. Plain drills
+    # stream gaplessly; Voice Mode needs the scheduler to fit speech between letters.
+    with week_letter_lookahead(letters) as lookahead:
+        if voice_enabled:
+            result = send_prepared(lookahead)
+        else:
+            result = play_stream(((entry, entry.buffer) for entry in lookahead), show=show_prepared)
+    if instrumentation_enabled:
+        print_blue(lookahead.status_line())
+        if not voice_enabled:
+            print_blue(stream_status_line())
+    return result
+
 def play_random_text(text_list, count=1) -> str:
     # Text is words or sentences.
     if count > 1:
@@ -318,8 +534,87 @@ def play_random_text(text_list, count=1) -> str:
         text = " ".join(selection)
     else:
         text = random.choice(text_list)
+    return play_drill_text(text)
+
+def play_drill_text(text, kind="random text") -> str:
+    begin_session(kind)
+    if copy_mode_enabled:
+        print_blue("Listen, and copy as you go if you like...")
     # Either it completes or they quit. We handle both the same.
-    play_text(text)
+    result = play_text(text)
+    if copy_mode_enabled and result != 'quit':
+        # One answer covers the whole text, so no per-character latency.
+        ask_for_copy(text, record_latency=False)
+        letter_weights.save()
+        print_copy_summary()
+    return result
+
+# === Copy Practice ===
+def copy_week_letters(letters=None) -> str:
+    """Copy drill on letters, or on the characters unlocked so far by the Koch method if None."""
+    print_blue("Listen, then type the letter you heard.")
+    with key_listener.listening():
+        while True:
+            letter = letter_weights.choose(letters or letter_weights.koch_letters)
+            if letter == ' ':
+                continue
+            if send_chars(letter, show=False) == 'quit' or ask_for_copy(letter) == 'quit':
+                break
+            if letters is None:
+                unlocked = letter_weights.check_progress()
+                if unlocked:
+                    print_blue(f"New character unlocked: {unlocked} ({morse_code[unlocked]})")
+    letter_weights.save()
+    print_copy_summary()
+    return 'quit'
+
+def ask_for_copy(sent, record_latency=True) -> str:
+    """Ask what was copied and grade it. An empty answer stops the drill."""
+    sent_at = time.monotonic()
+    # Lines typed while it was sending are the start of the copy.
+    typed = key_listener.take_typed()
+    with key_listener.suspended():
+        if typed:
+            print_blue(f"Copied while sending: {' '.join(typed)}")
+            typed.append(input("Copy the rest (Enter if that's all): "))
+        else:
+            typed.append(input("Copy (Enter alone to stop): "))
+    latency = time.monotonic() - sent_at
+    answer = " ".join(" ".join(typed).split())
+    if not answer:
+        return 'quit'
+
+    if not record_latency or len(typed) > 1:
+        # Part of the answer came before the prompt, so the wait means nothing.
+        latency = None
+    results = copy_grader.grade(sent, answer, latency)
+    for char, copied, correct in results:
+        letter_weights.record(char, correct, latency)
+        log_sent(char, copied, correct, latency)
+    if flash_card_mode_enabled:
+        # The cards were held back while it was sending; show what was sent now it's been copied.
+        print(word_cards(sent))
+    mistakes = [(char, copied) for char, copied, correct in results if not correct]
+    if not mistakes:
+        print_blue(f"Correct: {sent.upper()}")
+    else:
+        print_blue(f"Sent: {sent.upper()}")
+        for char, copied in mistakes:
+            copied_text = f"{copied} ({morse_code[copied]})" if copied in morse_code else (copied or "nothing")
+            print(f"  {char} ({morse_code[char]}) copied as {copied_text}")
+    return 'continue'
+
+def print_copy_summary() -> None:
+    if not copy_grader.sent:
+        return
+    print_blue(f"\nCopy accuracy: {copy_grader.accuracy:.0%} of {copy_grader.sent} characters "
+               f"(last {len(copy_grader.overall.results)}: {copy_grader.overall.value:.0%})")
+    if copy_grader.extra:
+        print_blue(f"Extra characters typed: {copy_grader.extra}, marking the characters beside them wrong")
+    print("Char  Sent  Accuracy  Recent  Median response")
+    for char, sent, accuracy, rolling, median in copy_grader.summary():
+        median_text = "-" if median is None else (f"<{median:.2f} s" if median != float("inf") else ">5 s")
+        print(f"{char:>4}  {sent:>4}  {accuracy:>8.0%}  {rolling:>6.0%}  {median_text}")
 
 # === Setting modifications ===
 def adjust_frequency():
@@ -336,8 +631,14 @@ def adjust_frequency():
         print("Invalid input.")
 
 # === Menus ===
+def update_timing():
+    global timing, dot_duration
+    timing = element_durations(current_wpm, farnsworth_wpm)
+    dot_duration = timing.dot
+
 def settings_menu():
-    global current_wpm, dot_duration, show_morse, flash_card_mode_enabled, voice_enabled
+    global current_wpm, farnsworth_wpm, show_morse, flash_card_mode_enabled, voice_enabled, waveform, rise_time_ms
+    global copy_mode_enabled, instrumentation_enabled
     while True:
         print_blue("\nSettings Menu")
         print_blue("0. Return to Main Menu")
@@ -346,15 +647,25 @@ def settings_menu():
         print_blue("3. Toggle Morse Display")
         print_blue("4. Toggle Flash Card Mode")
         print_blue("5. Toggle Voice Mode")
+        print_blue("6. Set Farnsworth WPM")
+        print_blue("7. Toggle Waveform (sine/square)")
+        print_blue("8. Set Rise Time")
+        print_blue("9. Toggle Copy Mode")
+        print_blue("10. Toggle Timing Instrumentation")
         choice = input("Choice: ").lower()
 
         if choice == '1':
             adjust_frequency()
         elif choice == '2':
             try:
-                current_wpm = int(input("Enter WPM (5-40): "))
-                if 5 <= current_wpm <= 40:
-                    dot_duration = 60.0 / (current_wpm * 50.0)
+                new_wpm = int(input("Enter WPM (5-40): "))
+                if 5 <= new_wpm <= 40:
+                    current_wpm = new_wpm
+                    if farnsworth_wpm > current_wpm:
+                        # Farnsworth spacing can't be faster than the characters; the store would turn it off too.
+                        farnsworth_wpm = 0
+                        print("Farnsworth WPM turned OFF, as it was above the new WPM")
+                    update_timing()
                     save_settings()
                     print(f"WPM set to {current_wpm}")
                 else:
@@ -374,6 +685,42 @@ def settings_menu():
             voice_enabled = not voice_enabled
             save_settings()
             print(f"Voice Mode is now {'ON' if voice_enabled else 'OFF'}")
+        elif choice == '6':
+            try:
+                new_wpm = int(input(f"Enter Farnsworth WPM (5-{current_wpm}, 0 for off): "))
+                if new_wpm == 0 or 5 <= new_wpm <= current_wpm:
+                    farnsworth_wpm = new_wpm
+                    update_timing()
+                    save_settings()
+                    print(f"Farnsworth WPM set to {farnsworth_wpm if farnsworth_wpm else 'OFF'}")
+                else:
+                    print("Invalid WPM.")
+            except ValueError:
+                print("Invalid input.")
+        elif choice == '7':
+            waveform = "square" if waveform == "sine" else "sine"
+            save_settings()
+            print(f"Waveform is now {waveform}")
+        elif choice == '8':
+            try:
+                new_rise_time = int(input("Enter rise time (0-20 ms): "))
+                if 0 <= new_rise_time <= 20:
+                    rise_time_ms = new_rise_time
+                    save_settings()
+                    print(f"Rise time set to {rise_time_ms} ms")
+                else:
+                    print("Invalid rise time.")
+            except ValueError:
+                print("Invalid input.")
+        elif choice == '9':
+            copy_mode_enabled = not copy_mode_enabled
+            save_settings()
+            print(f"Copy Mode is now {'ON' if copy_mode_enabled else 'OFF'}")
+        elif choice == '10':
+            instrumentation_enabled = not instrumentation_enabled
+            instrument.set_enabled(instrumentation_enabled)
+            save_settings()
+            print(f"Timing Instrumentation is now {'ON' if instrumentation_enabled else 'OFF'}")
         elif choice == '0':
             break
         else:
@@ -389,11 +736,15 @@ def practice_week_menu():
         else:
             display = ''.join(sorted(set(letters)))
         print_blue(f"{i}. Week {i} ({display})")
+    print_blue(f"8. Koch Method ({letter_weights.koch_letters}, copy practice)")
     choice = input("Choice: ").lower()
     if choice == '0':
         return
     elif choice in [str(i) for i in range(1, 8)]:
         practice_week_letters_continuously(int(choice))
+    elif choice == '8':
+        begin_session("koch")
+        copy_week_letters()
     else:
         print("Invalid choice.")
 
@@ -405,6 +756,10 @@ def random_word_menu():
     print_blue("3. Weeks 1–3 Words: " + ", ".join(week123_words))
     print_blue("4. Weeks 1–4 Words: " + ", ".join(week1234_words))
     print_blue("5. All Words: " + ", ".join(all_words))
+    print_blue("6. Real and Made-up Words (choose a week)")
+    print_blue("7. Number Group")
+    if get_corpus() is not None:
+        print_blue(f"8. Words from {os.path.basename(corpus_file)} (choose a week)")
     choice = input("Choice: ").lower()
     if choice == '0':
         return
@@ -418,6 +773,15 @@ def random_word_menu():
         play_random_text(week1234_words, count=3)
     elif choice == '5':
         play_random_text(all_words, count=3)
+    elif choice == '6':
+        letters = ask_for_letters()
+        if letters:
+            words = content.words(word_pool, letters, pseudo_word_share=0.5)
+            play_drill_text(" ".join(next(words) for _ in range(3)), "generated words")
+    elif choice == '7':
+        play_drill_text(next(content.number_groups()), "number group")
+    elif choice == '8' and get_corpus() is not None:
+        play_corpus_text()
     else:
         print("Invalid choice.")
 
@@ -429,6 +793,9 @@ def random_sentence_menu():
     print_blue("3. Weeks 1–3 Sentences: " + "; ".join(week123_sentences))
     print_blue("4. Weeks 1–4 Sentences: " + "; ".join(week1234_sentences))
     print_blue("5. Week 7 Sentences: " + "; ".join(week7_sentences))
+    print_blue("6. Generated Phrases (choose a week)")
+    if get_corpus() is not None:
+        print_blue(f"7. Phrases from {os.path.basename(corpus_file)} (choose a week)")
     choice = input("Choice: ").lower()
     if choice == '0':
         return
@@ -442,9 +809,56 @@ def random_sentence_menu():
         play_random_text(week1234_sentences)
     elif choice == '5':
         play_random_text(week7_sentences)
+    elif choice == '6':
+        letters = ask_for_letters()
+        if letters:
+            phrase = next(content.phrases(word_pool, letters, pseudo_word_share=0.3))
+            play_drill_text(phrase, "generated phrase")
+    elif choice == '7' and get_corpus() is not None:
+        play_corpus_text(phrases=True)
     else:
         print("Invalid choice.")
 
+def ask_for_week() -> int:
+    """Ask which week's letters to use, up to and including. Returns 0 if the answer is invalid."""
+    try:
+        week = int(input("Use letters up to week (1-7): "))
+    except ValueError:
+        week = 0
+    if not 1 <= week <= 7:
+        print("Invalid week.")
+        return 0
+    return week
+
+def ask_for_letters() -> str:
+    week = ask_for_week()
+    return letters_through_week(week) if week else ""
+
+# === Corpus ===
+def get_corpus():
+    """Open the word list named by the corpus_file setting the first time it is used, or None."""
+    global corpus
+    if corpus is None and corpus_file:
+        from corpus import Corpus
+        levels = [letters_through_week(week) for week in range(1, 8)]
+        try:
+            corpus = timed_startup_step("corpus load", lambda: Corpus(corpus_file, levels))
+        except OSError as error:
+            print(f"Warning: could not open {corpus_file} ({error}).")
+            return None
+    return corpus
+
+def play_corpus_text(phrases=False) -> str:
+    week = ask_for_week()
+    if not week:
+        return 'continue'
+    words = get_corpus().stream(week - 1, phrases, content.rng)
+    texts = [text for text, _ in zip(words, range(1 if phrases else 3))]
+    if not texts:
+        print(f"No {'phrases' if phrases else 'words'} in {corpus_file} use only letters up to week {week}.")
+        return 'continue'
+    return play_drill_text(" ".join(texts), "corpus phrase" if phrases else "corpus words")
+
 def show_main_menu():
     while True:
         print_blue("\n --------------------------------")
@@ -461,7 +875,10 @@ def show_main_menu():
         print_blue("8. Settings")
         if timeout_supported == True:
             print(f"\nPress [Enter] to Pause. Press [q] then [Enter] to Stop.")
-        print(f"\nDisplay: {'ON' if show_morse else 'OFF'} | Flash: {'ON' if flash_card_mode_enabled else 'OFF'} | Voice: {'ON' if voice_enabled else 'OFF'} | WPM: {current_wpm} | Frequency: {current_frequency}Hz")
+        print(f"\nDisplay: {'ON' if show_morse else 'OFF'} | Flash: {'ON' if flash_card_mode_enabled else 'OFF'} | Voice: {'ON' if voice_enabled else 'OFF'} | Copy: {'ON' if copy_mode_enabled else 'OFF'} | WPM: {current_wpm}{f'/{farnsworth_wpm}' if farnsworth_wpm else ''} | Frequency: {current_frequency}Hz")
+        if instrumentation_enabled:
+            print(instrument.status_line())
+            print(tone_cache_status_line())
         choice = input("Choice: ").lower()
 
         if choice == '1':
@@ -471,23 +888,336 @@ def show_main_menu():
         elif choice == '3':
             random_sentence_menu()
         elif choice == '4':
-            play_random_text(call_signs)
+            play_drill_text(next(content.call_signs()), "call sign")
         elif choice == '5':
             practice_week_letters_continuously(8)
         elif choice == '6':
             practice_week_letters_continuously(9)
         elif choice == '7':
             text = input("Enter custom text: ")
-            play_text(text)
+            # Only grade what can actually be sent, with one space between words.
+            text = " ".join("".join(char for char in text.upper() if char in morse_code or char.isspace()).split())
+            if text:
+                play_drill_text(text, "custom text")
         elif choice == '8':
             settings_menu()
         elif choice == '9':
             print("Goodbye!")
-            pygame.quit()
+            if audio is not None:
+                audio.close()
+            if session_log is not None:
+                session_log.close()
+            if instrumentation_enabled:
+                instrument.dump(TIMINGS_FILE)
+                print(f"Timings written to {TIMINGS_FILE}")
+            settings_store.close()
             break
         else:
             print("Invalid choice.")
 
+def print_startup_profile():
+    print_blue("Startup profile:")
+    for name, seconds in startup_timings.items():
+        print(f"  {name:<20} {seconds * 1000:8.1f} ms")
+
+# === Command Line ===
+def int_in_range(low, high):
+    def parse(value):
+        number = int(value)
+        if not low <= number <= high:
+            raise argparse.ArgumentTypeError(f"must be between {low} and {high}")
+        return number
+    return parse
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Morse Code Trainer", parents=[build_settings_parser()])
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="report import and initialisation timings, then start")
+    parser.add_argument("--seed", help="seed for generated content, so a run can be repeated")
+    parser.add_argument("--audio-file", default=audio_file, metavar="FILE",
+                        help="file the wav audio backend writes to")
+    subparsers = parser.add_subparsers(dest="command")
+
+    export_parser = subparsers.add_parser("export", help="render Morse code to a WAV or FLAC file")
+    source = export_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--text", help="text to send")
+    source.add_argument("--word-list", metavar="FILE", help="file with one word or phrase per line")
+    source.add_argument("--call-signs", type=int, metavar="COUNT", help="send COUNT generated call signs")
+    source.add_argument("--number-groups", type=int, metavar="COUNT", help="send COUNT groups of five digits")
+    export_parser.add_argument("--repeat", type=int, default=1, help="number of times to send the text")
+    export_parser.add_argument("--wpm", type=int_in_range(5, 40), default=current_wpm)
+    export_parser.add_argument("--farnsworth", type=int, default=farnsworth_wpm, metavar="WPM",
+                               help="effective speed for Farnsworth spacing, 0 for off")
+    export_parser.add_argument("--frequency", type=int_in_range(400, 1000), default=current_frequency)
+    export_parser.add_argument("--waveform", choices=["sine", "square"], default=waveform)
+    export_parser.add_argument("--rise-time", type=int_in_range(0, 20), default=rise_time_ms, metavar="MS")
+    export_parser.add_argument("--sample-rate", type=int, default=44100)
+    export_parser.add_argument("--channels", type=int_in_range(1, 2), default=1)
+    export_parser.add_argument("--out", required=True, help="output file (.wav or .flac)")
+
+    bulk_parser = subparsers.add_parser("bulk", help="render a full set of practice files in parallel")
+    bulk_parser.add_argument("--out-dir", default="practice_audio")
+    bulk_parser.add_argument("--wpm-min", type=int_in_range(5, 40), default=5)
+    bulk_parser.add_argument("--wpm-max", type=int_in_range(5, 40), default=40)
+    bulk_parser.add_argument("--wpm-step", type=int, default=1)
+    bulk_parser.add_argument("--groups", type=int, default=100, help="five-letter groups per week file")
+    bulk_parser.add_argument("--repeat", type=int, default=5, help="passes through each word list")
+    bulk_parser.add_argument("--farnsworth", type=int, default=farnsworth_wpm, metavar="WPM")
+    bulk_parser.add_argument("--frequency", type=int_in_range(400, 1000), default=current_frequency)
+    bulk_parser.add_argument("--waveform", choices=["sine", "square"], default=waveform)
+    bulk_parser.add_argument("--rise-time", type=int_in_range(0, 20), default=rise_time_ms, metavar="MS")
+    bulk_parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+
+    decode_parser = subparsers.add_parser("decode", help="copy Morse code from WAV files to text")
+    decode_parser.add_argument("files", nargs="+", metavar="FILE", help="16-bit WAV recordings")
+    decode_parser.add_argument("--frequency", type=int, default=None,
+                               help="tone frequency in Hz (found automatically if omitted)")
+
+    benchmark_parser = subparsers.add_parser("benchmark", help="measure keying timing against a perfect clock")
+    benchmark_parser.add_argument("--wpm", type=int_in_range(5, 40), nargs="+", default=list(range(5, 41, 5)))
+    benchmark_parser.add_argument("--modes", nargs="+", choices=BENCHMARK_MODES, default=list(BENCHMARK_MODES))
+    benchmark_parser.add_argument("--text", default="PARIS PARIS", help="text for the play_text mode")
+    benchmark_parser.add_argument("--letters", type=int, default=10,
+                                  help="characters for the send_chars and drill modes")
+    benchmark_parser.add_argument("--out", metavar="FILE", help="write the JSON report here instead of printing it")
+
+    history_parser = subparsers.add_parser("history", help="show practice totals by day and by character")
+    history_parser.add_argument("--since", metavar="YYYY-MM-DD", help="only count practice from this day on")
+
+    serve_parser = subparsers.add_parser("serve", help="serve the drills to a classroom over HTTP and WebSocket")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="address to listen on; 0.0.0.0 for the whole network")
+    serve_parser.add_argument("--port", type=int_in_range(1, 65535), default=8765)
+    serve_parser.add_argument("--max-sessions", type=int_in_range(1, 100000), default=1000)
+    serve_parser.add_argument("--cache-mb", type=int_in_range(1, 65536), default=64,
+                              help="memory for rendered audio shared by every session")
+    return parser
+
+def export_texts(args):
+    """Yield the texts to export, reading word lists lazily."""
+    for _ in range(args.repeat):
+        if args.text is not None:
+            yield args.text
+        elif args.word_list is not None:
+            with open(args.word_list, 'r') as f:
+                for line in f:
+                    yield line
+        else:
+            source = content.call_signs() if args.call_signs else content.number_groups()
+            for _ in range(args.call_signs or args.number_groups):
+                yield next(source)
+
+def run_export(args):
+    import_numpy()
+    from export import export_audio
+
+    export_timing = element_durations(args.wpm, args.farnsworth)
+    stats = export_audio(export_texts(args), args.out, morse_code, args.frequency, export_timing,
+                         args.sample_rate, args.channels, args.waveform, args.rise_time / 1000.0)
+    print(f"Wrote {stats['audio_seconds']:.1f} s of audio to {args.out} "
+          f"in {stats['elapsed_seconds']:.2f} s ({stats['realtime_factor']:.0f}x real time, "
+          f"{stats['samples'] / max(stats['elapsed_seconds'], 1e-9) / 1e6:.1f} M samples/s)")
+
+def build_bulk_jobs(args):
+    """One job per week, word list and sentence list at every WPM in range."""
+    text_lists = {
+        "week1_words": week1_words,
+        "week12_words": week12_words,
+        "week123_words": week123_words,
+        "week1234_words": week1234_words,
+        "all_words": all_words,
+        "week1_sentences": week1_sentences,
+        "week12_sentences": week12_sentences,
+        "week123_sentences": week123_sentences,
+        "week1234_sentences": week1234_sentences,
+        "week7_sentences": week7_sentences,
+    }
+    contents = {}
+    # Seed by name so every speed gets the same content and reruns can skip finished files.
+    for week in range(1, 8):
+        rng = random.Random(f"week{week}")
+        contents[f"week{week}_letters"] = [
+            "".join(rng.choice(week_letters[week]) for _ in range(5)) for _ in range(args.groups)
+        ]
+    for name, text_list in text_lists.items():
+        rng = random.Random(name)
+        texts = []
+        for _ in range(args.repeat):
+            texts.extend(rng.sample(text_list, len(text_list)))
+        contents[name] = texts
+
+    jobs = []
+    for wpm in range(args.wpm_min, args.wpm_max + 1, args.wpm_step):
+        for name, texts in contents.items():
+            jobs.append({
+                "file": f"{name}_{wpm}wpm.wav",
+                "texts": texts,
+                "wpm": wpm,
+                "farnsworth": args.farnsworth,
+                "frequency": args.frequency,
+                "waveform": args.waveform,
+                "rise_time": args.rise_time / 1000.0,
+            })
+    return jobs
+
+def run_bulk_export(args):
+    import_numpy()
+    from bulk import run_bulk
+
+    stats = run_bulk(build_bulk_jobs(args), args.out_dir, morse_code, args.workers)
+    print(f"Rendered {stats['rendered']} files ({stats['skipped']} already done) "
+          f"with {stats['audio_seconds'] / 3600:.1f} h of audio in {stats['elapsed_seconds']:.1f} s")
+
+def run_decode(args):
+    import_numpy()
+    from decoder import decode_wav
+
+    failed = False
+    for path in args.files:
+        try:
+            text, stats = decode_wav(path, morse_tree, args.frequency)
+        except (OSError, EOFError, ValueError, wave.Error) as error:
+            print(f"Error: could not decode {path} ({str(error) or 'not a complete WAV file'}).")
+            failed = True
+            continue
+        wpm = f"{stats['wpm']:.0f} WPM" if stats['wpm'] else "no signal"
+        print_blue(f"{path}: {wpm} at {stats['frequency']:.0f}Hz, "
+                   f"{stats['audio_seconds']:.1f} s in {stats['elapsed_seconds']:.2f} s "
+                   f"({stats['realtime_factor']:.0f}x real time)")
+        print(text)
+    if failed:
+        exit(1)
+
+def run_history(args):
+    log = get_session_log()
+    print_blue("Day         Sessions  Characters  Accuracy")
+    for day, sessions, sent, accuracy in log.daily_totals(args.since):
+        accuracy_text = "-" if accuracy is None else f"{accuracy:.0%}"
+        print(f"{day}  {sessions:>8}  {sent:>10}  {accuracy_text:>8}")
+    print_blue("\nChar  Copied  Accuracy  Mean response")
+    for char, attempts, accuracy, latency in log.character_stats(args.since):
+        latency_text = "-" if latency is None else f"{latency:.2f} s"
+        print(f"{char:>4}  {attempts:>6}  {accuracy:>8.0%}  {latency_text}")
+    log.close()
+
+def server_drills():
+    """The drills the practice server offers. Each makes one text from a session's ContentGenerator and a week."""
+    word_lists = {1: week1_words, 2: week12_words, 3: week123_words, 4: week1234_words}
+    sentence_lists = {1: week1_sentences, 2: week12_sentences, 3: week123_sentences, 4: week1234_sentences}
+    return {
+        "letters": lambda generator, week: " ".join(
+            islice(generator.letter_groups(week_letters.get(week, week_letters[7])), 5)),
+        "words": lambda generator, week: " ".join(
+            generator.rng.choice(word_lists.get(week, all_words)) for _ in range(3)),
+        "generated_words": lambda generator, week: " ".join(
+            islice(generator.words(word_pool, letters_through_week(week), pseudo_word_share=0.5), 3)),
+        "sentences": lambda generator, week: generator.rng.choice(sentence_lists.get(week, week7_sentences)),
+        "call_sign": lambda generator, week: next(generator.call_signs()),
+        "number_group": lambda generator, week: next(generator.number_groups()),
+    }
+
+def run_serve(args):
+    from server import PracticeServer
+
+    server = PracticeServer(morse_code, server_drills(), settings_store.settings,
+                            cache_bytes=args.cache_mb * 1024 * 1024, max_sessions=args.max_sessions,
+                            seed=args.seed)
+    server.run(args.host, args.port, on_ready=lambda address: print_blue(
+        f"Serving drills on http://{address[0]}:{address[1]}/ - press Ctrl+C to stop"))
+
+BENCHMARK_MODES = ("play_text", "send_chars", "drill")
+
+def run_benchmark(args):
+    """Send through a recording sink at each speed and report how far the keying strayed from the ideal grid."""
+    import_numpy()
+    import platform
+    from contextlib import redirect_stdout
+    from benchmark import RecordingBackend, Stopwatch, summarize
+
+    global audio, current_wpm, farnsworth_wpm, voice_enabled, copy_mode_enabled, history_enabled, stream_stats
+    # Whole dots only, and nothing but the keying.
+    farnsworth_wpm = 0
+    voice_enabled = False
+    copy_mode_enabled = False
+    history_enabled = False
+    letters = "".join(random.Random(0).choice(week_letters[7]) for _ in range(args.letters))
+
+    results = []
+    for wpm in args.wpm:
+        current_wpm = wpm
+        update_timing()
+        for mode in args.modes:
+            # The drill would go on for ever; the others run to the end of their text.
+            audio = RecordingBackend(timing.dot, stop_after=args.letters if mode == "drill" else None,
+                                     on_stop=lambda: key_listener.events.put(QUIT))
+            stream_stats = None
+            with redirect_stdout(io.StringIO()), Stopwatch() as watch:
+                if mode == "play_text":
+                    play_text(args.text)
+                elif mode == "send_chars":
+                    send_chars(letters)
+                else:
+                    practice_week_letters_continuously(7)
+            result = {"mode": mode, "wpm": wpm}
+            # Only the drill streams; the scheduler modes leave stream_stats unset.
+            result.update(summarize(audio, watch.cpu_seconds, watch.wall_seconds, stream_stats))
+            results.append(result)
+            print(f"{mode:<12} {wpm:>2} WPM  drift {result['drift_ms']:7.2f} ms  "
+                  f"jitter p99 {result['jitter_ms']['p99'] if result['jitter_ms'] else 0:6.2f} ms  "
+                  f"early {result['early_submits']:>3}  late {result['late_submits']:>3}  "
+                  f"underruns {result.get('underruns', '-'):>3}  "
+                  f"cpu {result['cpu_ms_per_character'] or 0:6.2f} ms/char", file=sys.stderr)
+
+    report = {
+        "version": 1,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "text": args.text,
+        "letters": args.letters,
+        "results": results,
+        "tone_cache": tone_cache_stats(),
+    }
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
 # === Main Program ===
+startup_timings["morsecode import"] = time.perf_counter() - _import_started
+
 if __name__ == "__main__":
+    parser = build_arg_parser()
+    args = parser.parse_args()
+    # The settings options were applied when the settings loaded; only bad ones are left to report.
+    for item in bad_overrides:
+        parser.error(f"--set {item}: expected SETTING=VALUE with a setting from {SETTINGS_FILE}")
+    audio_file = args.audio_file
+    if args.seed is not None:
+        content = ContentGenerator(args.seed)
+
+    if args.command == "export":
+        run_export(args)
+        exit(0)
+    elif args.command == "bulk":
+        run_bulk_export(args)
+        exit(0)
+    elif args.command == "decode":
+        run_decode(args)
+        exit(0)
+    elif args.command == "history":
+        run_history(args)
+        exit(0)
+    elif args.command == "benchmark":
+        run_benchmark(args)
+        exit(0)
+    elif args.command == "serve":
+        run_serve(args)
+        exit(0)
+
+    if args.profile_startup:
+        # Time the deferred steps too, so the whole cost is visible up front.
+        init_audio()
+        if voice_enabled:
+            get_speech_worker()
+        print_startup_profile()
     show_main_menu()
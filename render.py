@@ -0,0 +1,64 @@
+import numpy as np
+
+from synth import DEFAULT_RISE_TIME, element_template, to_channels
+from timing import build_timeline
+
+
+def render_timeline(events, frequency, sample_rate=44100, channels=2, waveform="sine",
+                    rise_time=DEFAULT_RISE_TIME):
+    """
+    Renders a keying timeline into one contiguous int16 buffer.
+
+    Event boundaries are rounded from the running total rather than per event,
+    so rounding never accumulates and every element starts on the nearest
+    sample to its nominal time. Elements are copied from cached, shaped
+    templates (see synth.py), so nothing is synthesized per element.
+
+    Args:
+        events (list): (key_down, seconds) events, as built by timing.build_timeline.
+        frequency (int): Tone frequency in Hz.
+        sample_rate (int): Output sample rate in Hz.
+        channels (int): Number of output channels.
+        waveform (str): Tone waveform, one of synth.WAVEFORMS.
+        rise_time (float): Rise and fall time of each element in seconds.
+
+    Returns:
+        numpy.ndarray: Array of shape (samples, channels) ready for playback.
+    """
+    states = np.fromiter((down for down, _ in events), dtype=bool, count=len(events))
+    seconds = np.fromiter((s for _, s in events), dtype=np.float64, count=len(events))
+    boundaries = np.rint(np.cumsum(seconds) * sample_rate).astype(np.int64)
+    starts = np.concatenate(([0], boundaries[:-1])).astype(np.int64)
+    lengths = boundaries - starts
+
+    output = np.zeros(boundaries[-1] if len(events) else 0, dtype=np.int16)
+    on_starts = starts[states]
+    on_lengths = lengths[states]
+    # Dots and dashes each have (almost) a single length, so this loops a few times at most.
+    for length in np.unique(on_lengths):
+        positions = on_starts[on_lengths == length]
+        template = element_template(frequency, int(length), sample_rate, waveform, rise_time)
+        output[positions[:, None] + np.arange(length)] = template
+    return to_channels(output, channels)
+
+
+def render_text(text, code_table, frequency, timing, sample_rate=44100, channels=2, waveform="sine",
+                rise_time=DEFAULT_RISE_TIME):
+    """
+    Renders text into one contiguous int16 buffer with every gap baked in.
+
+    Args:
+        text (str): The text to render.
+        code_table (dict): Mapping of characters to dot-dash patterns.
+        frequency (int): Tone frequency in Hz.
+        timing (timing.Timing): Element and gap durations.
+        sample_rate (int): Output sample rate in Hz.
+        channels (int): Number of output channels.
+        waveform (str): Tone waveform, one of synth.WAVEFORMS.
+        rise_time (float): Rise and fall time of each element in seconds.
+
+    Returns:
+        numpy.ndarray: Array of shape (samples, channels) ready for playback.
+    """
+    events = build_timeline(text, code_table, timing)
+    return render_timeline(events, frequency, sample_rate, channels, waveform, rise_time)
@@ -0,0 +1,237 @@
+import asyncio
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from keyinput import ENTER, QUIT
+
+# How often the keyboard task looks for key events, and how often speech is
+# checked for having finished.
+POLL_INTERVAL = 0.01
+
+
+class Timeline:
+    """
+    A monotonic clock that stops while paused.
+
+    Everything in a job is scheduled in timeline seconds, so pausing freezes
+    every task at once and resuming picks up exactly where they left off.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.paused_seconds = 0.0
+        self.paused_at = None
+        self.running = asyncio.Event()
+        self.running.set()
+        self.paused = asyncio.Event()
+
+    def now(self):
+        clock = self.paused_at if self.paused_at is not None else time.monotonic()
+        return clock - self.started - self.paused_seconds
+
+    def pause(self):
+        if self.paused_at is None:
+            self.paused_at = time.monotonic()
+            self.running.clear()
+            self.paused.set()
+
+    def resume(self):
+        if self.paused_at is not None:
+            self.paused_seconds += time.monotonic() - self.paused_at
+            self.paused_at = None
+            self.paused.clear()
+            self.running.set()
+
+    async def sleep_until(self, when):
+        """Sleep until the timeline reaches when, however many pauses come in between."""
+        while True:
+            if self.paused_at is not None:
+                await self.running.wait()
+                continue
+            remaining = when - self.now()
+            if remaining <= 0:
+                return
+            try:
+                # Wake early if paused, so the deadline is worked out again afterwards.
+                await asyncio.wait_for(self.paused.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+
+class SendJob:
+    """
+    Sends text as concurrent asyncio tasks on one Timeline.
+
+    The sender task works out when each character starts from the lengths of
+    the ones before it, rather than from when the previous wait happened to
+    end, so lateness never accumulates. It takes and renders the next
+    character on a worker thread while the current one plays, so waiting on
+    a slow item never holds up the keyboard task. The screen and speech
+    tasks act on the same timeline, so the display changes as the sound
+    starts and speech comes a word gap after its letter.
+
+    Items are usually characters, but may be anything sound_for, show and
+    speak understand, such as characters prepared ahead by lookahead.LookAhead.
+
+    Args:
+        items (iterable): Items to send; may be an endless generator.
+        timing (timing.Timing): Element and gap durations.
+        sound_for (callable): Returns (sound, seconds) for an item, including
+            its letter gap. Called from the worker thread. The sound is None
+            for a word space, which is silence for the given seconds.
+        play (callable): Starts a sound and returns at once.
+        show (callable): Shows an item as it starts, or None.
+        speak (callable): Queues an item to be spoken, or None for no speech.
+        speech_busy (callable): True while speech is still playing.
+    """
+
+    def __init__(self, items, timing, sound_for, play, show=None, speak=None, speech_busy=None):
+        self.items = items
+        self.timing = timing
+        self.sound_for = sound_for
+        self.play = play
+        self.show = show
+        self.speak = speak
+        self.speech_busy = speech_busy or (lambda: False)
+        self.characters_sent = 0
+
+    async def run(self, timeline):
+        screen = asyncio.Queue()
+        screen_task = asyncio.create_task(self._screen(timeline, screen))
+        try:
+            await self._send(timeline, screen)
+            await screen.join()
+        finally:
+            screen_task.cancel()
+
+    async def _send(self, timeline, screen):
+        loop = asyncio.get_running_loop()
+        items = iter(self.items)
+        # One worker, so items are taken in order; it isn't waited for on the
+        # way out, as a cancelled job may leave it blocked on the next item.
+        worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="send")
+        try:
+            await self._send_items(timeline, screen, loop, worker, items)
+        finally:
+            worker.shutdown(wait=False)
+
+    async def _send_items(self, timeline, screen, loop, worker, items):
+        start = None
+        while True:
+            ready = await loop.run_in_executor(worker, self._next, items)
+            if ready is None:
+                break
+            item, sound, seconds = ready
+            if start is None:
+                if sound is None:
+                    # Nothing to space from yet.
+                    continue
+                # Start the clock once the first sound is ready, so rendering it doesn't make it late.
+                start = timeline.now()
+            screen.put_nowait((start, item))
+            if sound is None:
+                start += seconds
+                continue
+
+            await timeline.sleep_until(start)
+            self.play(sound)
+            self.characters_sent += 1
+            start += seconds
+
+            if self.speak is not None:
+                start = await self._say(timeline, start + self.timing.word_gap, item)
+        if start is not None:
+            await timeline.sleep_until(start)
+
+    def _next(self, items):
+        """The next item with its sound and length, or None once they run out."""
+        for item in items:
+            return (item, *self.sound_for(item))
+        return None
+
+    async def _say(self, timeline, when, item):
+        """Speak item at when; returns when the next item may start."""
+        await timeline.sleep_until(when)
+        self.speak(item)
+        ready = timeline.now() + self.timing.letter_gap
+        while self.speech_busy():
+            await timeline.sleep_until(timeline.now() + POLL_INTERVAL)
+        return max(ready, timeline.now())
+
+    async def _screen(self, timeline, screen):
+        while True:
+            when, item = await screen.get()
+            await timeline.sleep_until(when)
+            if self.show is not None:
+                self.show(item)
+            screen.task_done()
+
+
+class PlaybackScheduler:
+    """
+    Runs send jobs on an asyncio event loop alongside a keyboard task.
+
+    Enter pauses the timeline and q cancels every task of the job straight
+    away, even part way through a character.
+
+    Args:
+        key_listener (keyinput.KeyListener): Source of ENTER and QUIT events.
+        on_pause (callable): Called when paused, to pause audio and say so.
+        on_resume (callable): Called when resumed.
+        on_quit (callable): Called when the job is cancelled, to silence it.
+    """
+
+    def __init__(self, key_listener, on_pause=None, on_resume=None, on_quit=None):
+        self.key_listener = key_listener
+        self.on_pause = on_pause
+        self.on_resume = on_resume
+        self.on_quit = on_quit
+
+    def run(self, job):
+        """
+        Run a job to the end or until it is cancelled.
+
+        Returns:
+            str: 'quit' if q was pressed, otherwise 'continue'.
+        """
+        return asyncio.run(self._run(job))
+
+    async def _run(self, job):
+        timeline = Timeline()
+        job_task = asyncio.create_task(job.run(timeline))
+        keyboard_task = asyncio.create_task(self._keyboard(timeline))
+        done, _ = await asyncio.wait({job_task, keyboard_task}, return_when=asyncio.FIRST_COMPLETED)
+        for task in (job_task, keyboard_task):
+            task.cancel()
+        await asyncio.gather(job_task, keyboard_task, return_exceptions=True)
+        if keyboard_task in done:
+            if self.on_quit is not None:
+                self.on_quit()
+            return 'quit'
+        # Let errors from the job surface.
+        job_task.result()
+        return 'continue'
+
+    async def _keyboard(self, timeline):
+        """Returns when q is pressed."""
+        while True:
+            event = self._next_event()
+            if event is None:
+                await asyncio.sleep(POLL_INTERVAL)
+            elif event == QUIT:
+                return
+            elif event == ENTER and timeline.paused_at is None:
+                timeline.pause()
+                if self.on_pause is not None:
+                    self.on_pause()
+            elif event == ENTER:
+                timeline.resume()
+                if self.on_resume is not None:
+                    self.on_resume()
+
+    def _next_event(self):
+        try:
+            return self.key_listener.events.get_nowait()
+        except queue.Empty:
+            return None
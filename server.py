@@ -0,0 +1,644 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import struct
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, replace
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from content import ContentGenerator
+from render import render_text
+from settings import Settings, validate
+from timing import element_durations
+
+logger = logging.getLogger(__name__)
+
+# Audio is served as 16-bit mono PCM at this rate.
+SAMPLE_RATE = 44100
+
+# Audio is written to clients in pieces of this size, waiting for each to drain.
+CHUNK_BYTES = 16384
+
+# Rendered characters kept in memory, least recently used dropped first.
+CACHE_BYTES = 64 * 1024 * 1024
+
+# Threads rendering characters the cache doesn't have yet.
+RENDER_THREADS = 4
+
+# Sessions are dropped after this long without a request, and checked this often.
+SESSION_IDLE_SECONDS = 3600
+SWEEP_INTERVAL = 60
+
+MAX_SESSIONS = 1000
+MAX_HEADER_BYTES = 16384
+MAX_BODY_BYTES = 65536
+MAX_TEXT_LENGTH = 1000
+
+# The settings a student can change for their own session; the rest are for the local program.
+SESSION_FIELDS = ("current_frequency", "current_wpm", "farnsworth_wpm", "waveform", "rise_time_ms")
+
+# Query parameter names for the settings that make up an audio URL.
+AUDIO_PARAMS = {
+    "frequency": "current_frequency",
+    "wpm": "current_wpm",
+    "farnsworth": "farnsworth_wpm",
+    "waveform": "waveform",
+    "rise": "rise_time_ms",
+}
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+REASONS = {
+    200: "OK", 201: "Created", 204: "No Content", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def wav_header(data_bytes, sample_rate=SAMPLE_RATE, channels=1):
+    """The 44-byte header of a 16-bit PCM WAV file holding data_bytes of samples."""
+    block_align = channels * 2
+    return struct.pack("<4sI4s4sIHHIIHH4sI", b"RIFF", 36 + data_bytes, b"WAVE", b"fmt ", 16, 1, channels,
+                       sample_rate, sample_rate * block_align, block_align, 16, b"data", data_bytes)
+
+
+def chunked(clips):
+    """The clips as pieces of at most CHUNK_BYTES, without copying them."""
+    for clip in clips:
+        view = memoryview(clip)
+        for start in range(0, len(view), CHUNK_BYTES):
+            yield view[start:start + CHUNK_BYTES]
+
+
+def render_key(settings):
+    """Everything about a session's settings that changes how text sounds."""
+    return tuple(getattr(settings, name) for name in SESSION_FIELDS)
+
+
+def clean_text(text, code_table):
+    """Upper case text with unsendable characters and extra spaces removed."""
+    words = ("".join(char for char in word if char in code_table) for word in text.upper().split())
+    return " ".join(word for word in words if word)
+
+
+# === Audio Cache ===
+class AudioCache:
+    """
+    Rendered characters as PCM bytes, shared by every session.
+
+    Each character is rendered once per (character, speed, Farnsworth speed,
+    frequency, waveform, rise time), gaps included, and a text is sent as
+    the cached characters one after another, as the tone cache does for the
+    local program, so no buffer the length of the whole text is built.
+    Random letter groups then cost no more to serve than a fixed word list,
+    and a classroom at a few settings shares a few megabytes of audio.
+    Renders run on a thread pool to keep the event loop free, and requests
+    for a character that is already being rendered wait for that render
+    instead of starting another.
+
+    Args:
+        code_table (dict): Mapping of characters to dot-dash patterns.
+        sample_rate (int): Sample rate of the rendered audio.
+        max_bytes (int): Memory the cached characters may use.
+    """
+
+    def __init__(self, code_table, sample_rate=SAMPLE_RATE, max_bytes=CACHE_BYTES):
+        self.code_table = code_table
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.clips = OrderedDict()
+        self.pending = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.executor = ThreadPoolExecutor(RENDER_THREADS, thread_name_prefix="render")
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {"clips": len(self.clips), "bytes": self.size, "hits": self.hits, "misses": self.misses,
+                "shared": self.shared, "rendering": len(self.pending)}
+
+    async def text_clips(self, text, key):
+        """The PCM clip of each character of text cleaned by clean_text, with key from render_key."""
+        # Fetch each different character once, all at the same time.
+        unique = list(dict.fromkeys(text))
+        clips = dict(zip(unique, await asyncio.gather(*(self.clip(char, key) for char in unique))))
+        return [clips[char] for char in text]
+
+    async def clip(self, char, key):
+        cache_key = (char,) + key
+        pcm = self.clips.get(cache_key)
+        if pcm is not None:
+            self.clips.move_to_end(cache_key)
+            self.hits += 1
+            return pcm
+
+        future = self.pending.get(cache_key)
+        if future is None:
+            self.misses += 1
+            future = asyncio.get_running_loop().run_in_executor(self.executor, self._render, char, key)
+            future.add_done_callback(lambda done: self._store(cache_key, done))
+            self.pending[cache_key] = future
+        else:
+            self.shared += 1
+        # Shielded, so a client that goes away doesn't cancel a render others are waiting for.
+        return await asyncio.shield(future)
+
+    def _store(self, cache_key, future):
+        del self.pending[cache_key]
+        if future.cancelled() or future.exception() is not None:
+            return
+        pcm = future.result()
+        self.clips[cache_key] = pcm
+        self.size += len(pcm)
+        while self.size > self.max_bytes and len(self.clips) > 1:
+            _, dropped = self.clips.popitem(last=False)
+            self.size -= len(dropped)
+
+    def _render(self, char, key):
+        frequency, wpm, farnsworth, waveform, rise_time_ms = key
+        timing = element_durations(wpm, farnsworth)
+        if char == " ":
+            # Characters end with a letter gap; the space adds the rest of a word gap.
+            return bytes(2 * round((timing.word_gap - timing.letter_gap) * self.sample_rate))
+        buffer = render_text(char, self.code_table, frequency, timing, self.sample_rate, 1, waveform,
+                             rise_time_ms / 1000.0)
+        return buffer.tobytes()
+
+
+# === Sessions ===
+class Session:
+    """
+    One student's settings and content generator.
+
+    Args:
+        defaults (settings.Settings): Settings a new session starts from.
+        seed: Seed for the session's ContentGenerator, or None.
+    """
+
+    def __init__(self, defaults, seed=None):
+        self.id = uuid.uuid4().hex
+        self.settings = defaults
+        self.content = ContentGenerator(seed)
+        self.last_seen = time.monotonic()
+
+    def update(self, values):
+        """Change settings from a dict. Returns the problems found; unusable values get the default."""
+        problems = []
+        changes = {}
+        for name, value in values.items():
+            if name in SESSION_FIELDS:
+                changes[name] = value
+            else:
+                problems.append(f"{name}: not a session setting")
+        settings, invalid = validate({**asdict(self.settings), **changes})
+        self.settings = replace(self.settings, **{name: getattr(settings, name) for name in SESSION_FIELDS})
+        return problems + invalid
+
+    def public_settings(self):
+        return {name: getattr(self.settings, name) for name in SESSION_FIELDS}
+
+
+# === Server ===
+class PracticeServer:
+    """
+    Serves the drills to many students at once over HTTP and WebSocket.
+
+    Each student creates a session and gets drills rendered at their own
+    settings instead of the program's own. All audio comes from one
+    AudioCache. Over HTTP a drill returns its text and the URLs of its audio
+    as WAV and raw PCM; over a WebSocket the audio follows the drill as
+    binary messages. See the README for the API.
+
+    Args:
+        code_table (dict): Mapping of characters to dot-dash patterns.
+        drills (dict): Drill name to a function taking a ContentGenerator and
+            a week number and returning the text to send.
+        defaults (settings.Settings): Settings new sessions start from.
+        sample_rate (int): Sample rate of the served audio.
+        cache_bytes (int): Memory the audio cache may use.
+        max_sessions (int): Sessions allowed at once.
+        seed: Seeds each session's content generator in turn, for repeatable runs.
+    """
+
+    def __init__(self, code_table, drills, defaults=None, sample_rate=SAMPLE_RATE, cache_bytes=CACHE_BYTES,
+                 max_sessions=MAX_SESSIONS, seed=None):
+        self.code_table = code_table
+        self.drills = drills
+        self.defaults = defaults or Settings()
+        self.sample_rate = sample_rate
+        self.max_sessions = max_sessions
+        self.seed = seed
+        self.cache = AudioCache(code_table, sample_rate, cache_bytes)
+        self.sessions = {}
+        self.sessions_created = 0
+        self.connections = 0
+        self.requests = 0
+
+    def run(self, host, port, on_ready=None):
+        """Serve until interrupted."""
+        try:
+            asyncio.run(self.serve(host, port, on_ready))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.cache.close()
+
+    async def serve(self, host, port, on_ready=None):
+        server = await asyncio.start_server(self._handle_connection, host, port, limit=MAX_HEADER_BYTES)
+        sweeper = asyncio.create_task(self._sweep())
+        if on_ready is not None:
+            on_ready(server.sockets[0].getsockname())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            sweeper.cancel()
+
+    def stats(self):
+        return {"sessions": len(self.sessions), "connections": self.connections, "requests": self.requests,
+                "cache": self.cache.stats()}
+
+    # === Sessions ===
+    def create_session(self, values=None):
+        if len(self.sessions) >= self.max_sessions:
+            raise HttpError(503, "too many sessions")
+        seed = None if self.seed is None else f"{self.seed}-{self.sessions_created}"
+        session = Session(self.defaults, seed)
+        self.sessions_created += 1
+        problems = session.update(values or {})
+        self.sessions[session.id] = session
+        return session, problems
+
+    def get_session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise HttpError(404, "no such session")
+        session.last_seen = time.monotonic()
+        return session
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL)
+            cutoff = time.monotonic() - SESSION_IDLE_SECONDS
+            for session_id in [s.id for s in self.sessions.values() if s.last_seen < cutoff]:
+                del self.sessions[session_id]
+
+    # === Drills ===
+    def make_drill(self, session, name, week=None, text=None):
+        """Pick the text for a drill. Returns (drill name, cleaned text)."""
+        # Over a WebSocket these come from JSON, so they may be numbers or anything else.
+        text = "" if text is None else str(text)
+        if name == "text":
+            if not text:
+                raise HttpError(400, "the text drill needs some text")
+        elif name in self.drills:
+            try:
+                week = int(str(week or 1))
+            except ValueError:
+                week = 0
+            if week < 1:
+                raise HttpError(400, "week must be a number from 1")
+            text = self.drills[name](session.content, week)
+        else:
+            raise HttpError(404, f"no drill named {name!r}; try one of: text, {', '.join(self.drills)}")
+        text = clean_text(text[:MAX_TEXT_LENGTH], self.code_table)
+        if not text:
+            raise HttpError(400, "nothing in the text can be sent")
+        return name, text
+
+    def describe(self, session, name, text, pcm_bytes):
+        params = {"text": text}
+        params.update({param: getattr(session.settings, name) for param, name in AUDIO_PARAMS.items()})
+        query = urlencode(params)
+        return {
+            "drill": name,
+            "text": text,
+            "seconds": pcm_bytes / 2 / self.sample_rate,
+            "sample_rate": self.sample_rate,
+            "channels": 1,
+            "wav": f"/audio.wav?{query}",
+            "pcm": f"/audio.pcm?{query}",
+        }
+
+    # === HTTP ===
+    async def _handle_connection(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request = await self._read_request(reader, writer)
+                if request is None:
+                    break
+                method, path, query, headers, body = request
+                self.requests += 1
+                if headers.get("upgrade", "").lower() == "websocket":
+                    await self._websocket(reader, writer, path, headers)
+                    break
+                try:
+                    await self._route(writer, method, path, query, body)
+                except HttpError as e:
+                    await self._send_json(writer, e.status, {"error": str(e)})
+                except (ConnectionError, asyncio.CancelledError):
+                    raise
+                except Exception:
+                    logger.exception("%s %s failed", method, path)
+                    await self._send_json(writer, 500, {"error": "internal error"})
+                    break
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _read_request(self, reader, writer):
+        """Read one request. Returns (method, path, query, headers, body), or None when the client is done."""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            await self._send_json(writer, 413, {"error": "request headers too large"})
+            return None
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            await self._send_json(writer, 400, {"error": "bad request line"})
+            return None
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name:
+                headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            length = -1
+        if not 0 <= length <= MAX_BODY_BYTES:
+            await self._send_json(writer, 413, {"error": "bad or too large Content-Length"})
+            return None
+        body = await reader.readexactly(length) if length else b""
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        return method.upper(), url.path, query, headers, body
+
+    async def _route(self, writer, method, path, query, body):
+        parts = [part for part in path.split("/") if part]
+        if path in ("/audio.wav", "/audio.pcm") and method == "GET":
+            await self._send_audio(writer, query, wav=path.endswith(".wav"))
+        elif not parts and method == "GET":
+            await self._send_json(writer, 200, {"drills": ["text", *self.drills], **self.stats()})
+        elif parts == ["sessions"] and method == "POST":
+            session, problems = self.create_session(self._json_body(body))
+            await self._send_json(writer, 201, {"id": session.id, "settings": session.public_settings(),
+                                                "problems": problems})
+        elif len(parts) == 2 and parts[0] == "sessions":
+            session = self.get_session(parts[1])
+            if method == "GET":
+                await self._send_json(writer, 200, {"id": session.id, "settings": session.public_settings()})
+            elif method in ("PATCH", "PUT"):
+                problems = session.update(self._json_body(body))
+                await self._send_json(writer, 200, {"id": session.id, "settings": session.public_settings(),
+                                                    "problems": problems})
+            elif method == "DELETE":
+                del self.sessions[session.id]
+                await self._send(writer, 204, b"")
+            else:
+                raise HttpError(405, f"{method} is not allowed here")
+        elif len(parts) == 4 and parts[0] == "sessions" and parts[2] == "drills" and method == "GET":
+            session = self.get_session(parts[1])
+            name, text = self.make_drill(session, parts[3], query.get("week"), query.get("text"))
+            clips = await self.cache.text_clips(text, render_key(session.settings))
+            await self._send_json(writer, 200, self.describe(session, name, text, sum(map(len, clips))))
+        else:
+            raise HttpError(404, f"nothing at {method} {path}")
+
+    def _json_body(self, body):
+        if not body:
+            return {}
+        try:
+            values = json.loads(body)
+        except ValueError:
+            raise HttpError(400, "body is not valid JSON")
+        if not isinstance(values, dict):
+            raise HttpError(400, "body must be a JSON object")
+        return values
+
+    async def _send_audio(self, writer, query, wav):
+        """Send cached audio for the text and settings in the query, a character at a time."""
+        values = {name: query[param] for param, name in AUDIO_PARAMS.items() if param in query}
+        settings, problems = validate({**asdict(self.defaults), **values})
+        if problems:
+            raise HttpError(400, "; ".join(problems))
+        text = clean_text(query.get("text", "")[:MAX_TEXT_LENGTH], self.code_table)
+        if not text:
+            raise HttpError(400, "nothing in the text can be sent")
+        clips = await self.cache.text_clips(text, render_key(settings))
+        pcm_bytes = sum(map(len, clips))
+        header = wav_header(pcm_bytes, self.sample_rate) if wav else b""
+        content_type = "audio/wav" if wav else "application/octet-stream"
+        await self._send_head(writer, 200, content_type, len(header) + pcm_bytes,
+                              {"X-Sample-Rate": str(self.sample_rate), "X-Channels": "1",
+                               "Cache-Control": "public, max-age=86400"})
+        writer.write(header)
+        for chunk in chunked(clips):
+            writer.write(chunk)
+            await writer.drain()
+
+    async def _send_json(self, writer, status, value):
+        await self._send(writer, status, json.dumps(value).encode(), "application/json")
+
+    async def _send(self, writer, status, body, content_type="text/plain"):
+        await self._send_head(writer, status, content_type, len(body))
+        writer.write(body)
+        await writer.drain()
+
+    async def _send_head(self, writer, status, content_type, length, extra=None):
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Type: {content_type}",
+                 f"Content-Length: {length}", "Access-Control-Allow-Origin: *"]
+        lines.extend(f"{name}: {value}" for name, value in (extra or {}).items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+    # === WebSocket ===
+    async def _websocket(self, reader, writer, path, headers):
+        """
+        Drill over a WebSocket at /sessions/<id>/ws.
+
+        The client sends JSON: {"type": "drill", "drill": ..., "week": ...,
+        "text": ...}, {"type": "settings", "settings": {...}} or {"type": "stop"}.
+        A drill is answered with its description, then its PCM audio as binary
+        messages, then {"type": "end"}. A new drill or stop cuts off the one
+        being sent.
+        """
+        parts = [part for part in path.split("/") if part]
+        key = headers.get("sec-websocket-key")
+        if len(parts) != 3 or parts[0] != "sessions" or parts[2] != "ws" or not key:
+            await self._send_json(writer, 400, {"error": "WebSocket connections go to /sessions/<id>/ws"})
+            return
+        try:
+            session = self.get_session(parts[1])
+        except HttpError as e:
+            await self._send_json(writer, e.status, {"error": str(e)})
+            return
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        socket = WebSocket(reader, writer)
+        sending = None
+        try:
+            while True:
+                message = await socket.receive()
+                if message is None:
+                    break
+                session.last_seen = time.monotonic()
+                try:
+                    request = json.loads(message)
+                    kind = request.get("type")
+                except (ValueError, AttributeError):
+                    await socket.send_json({"type": "error", "message": "messages must be JSON objects"})
+                    continue
+                if kind in ("drill", "stop") and sending is not None:
+                    sending.cancel()
+                    sending = None
+                if kind == "drill":
+                    sending = asyncio.create_task(self._send_drill(socket, session, request))
+                elif kind == "settings":
+                    values = request.get("settings")
+                    problems = session.update(values if isinstance(values, dict) else {})
+                    await socket.send_json({"type": "settings", "settings": session.public_settings(),
+                                            "problems": problems})
+                elif kind != "stop":
+                    await socket.send_json({"type": "error", "message": f"unknown message type {kind!r}"})
+        finally:
+            if sending is not None:
+                sending.cancel()
+            await socket.close()
+
+    async def _send_drill(self, socket, session, request):
+        try:
+            await self._send_drill_audio(socket, session, request)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # The student went away part way through; the receive loop sees it too.
+            pass
+
+    async def _send_drill_audio(self, socket, session, request):
+        try:
+            name, text = self.make_drill(session, str(request.get("drill", "")), request.get("week"),
+                                         request.get("text"))
+            clips = await self.cache.text_clips(text, render_key(session.settings))
+        except HttpError as e:
+            await socket.send_json({"type": "error", "message": str(e)})
+            return
+        except Exception:
+            logger.exception("WebSocket drill %r failed", request)
+            await socket.send_json({"type": "error", "message": "internal error"})
+            return
+        await socket.send_json({"type": "drill", **self.describe(session, name, text, sum(map(len, clips)))})
+        for chunk in chunked(clips):
+            await socket.send(chunk, binary=True)
+        await socket.send_json({"type": "end"})
+
+
+class WebSocket:
+    """The server side of a WebSocket connection (RFC 6455), after the handshake."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        # Frames from different tasks must not interleave while one waits to drain.
+        self.lock = asyncio.Lock()
+        self.closed = False
+        # Opcode of the message that continuation frames belong to.
+        self.continued = 0x1
+
+    async def receive(self):
+        """The next text or binary message, or None once the connection closes."""
+        fragments = []
+        size = 0
+        while True:
+            try:
+                opcode, fin, payload = await self._read_frame()
+            except (asyncio.IncompleteReadError, ConnectionError):
+                return None
+            if opcode == 0x8:
+                return None
+            if opcode == 0x9:
+                await self._write_frame(0xA, payload)
+                continue
+            if opcode == 0xA:
+                continue
+            size += len(payload)
+            if size > MAX_BODY_BYTES:
+                await self.close(1009)
+                return None
+            fragments.append(payload)
+            if fin:
+                data = b"".join(fragments)
+                return data if opcode == 0x2 else data.decode("utf-8", "replace")
+
+    async def send(self, data, binary=False):
+        await self._write_frame(0x2 if binary else 0x1, data if binary else data.encode())
+
+    async def send_json(self, value):
+        await self.send(json.dumps(value))
+
+    async def close(self, code=1000):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            await self._write_frame(0x8, struct.pack("!H", code))
+        except ConnectionError:
+            pass
+
+    async def _read_frame(self):
+        first, second = await self.reader.readexactly(2)
+        length = second & 0x7F
+        if length == 126:
+            length, = struct.unpack("!H", await self.reader.readexactly(2))
+        elif length == 127:
+            length, = struct.unpack("!Q", await self.reader.readexactly(8))
+        if length > MAX_BODY_BYTES:
+            raise ConnectionError("frame too large")
+        mask = await self.reader.readexactly(4) if second & 0x80 else None
+        payload = await self.reader.readexactly(length)
+        if mask is not None:
+            # Clients mask every frame; XOR the payload with the repeating 4-byte key.
+            key = int.from_bytes((mask * (length // 4 + 1))[:length], "big")
+            payload = (int.from_bytes(payload, "big") ^ key).to_bytes(length, "big")
+        # A continuation frame (opcode 0) keeps the opcode of the message it continues.
+        opcode = first & 0x0F
+        if opcode == 0:
+            opcode = self.continued
+        elif opcode < 0x8:
+            self.continued = opcode
+        return opcode, bool(first & 0x80), payload
+
+    async def _write_frame(self, opcode, payload):
+        length = len(payload)
+        if length < 126:
+            head = struct.pack("!BB", 0x80 | opcode, length)
+        elif length < 1 << 16:
+            head = struct.pack("!BBH", 0x80 | opcode, 126, length)
+        else:
+            head = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+        async with self.lock:
+            self.writer.write(head)
+            self.writer.write(payload)
+            await self.writer.drain()
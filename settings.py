@@ -0,0 +1,231 @@
+import json
+import math
+import os
+import threading
+from dataclasses import asdict, dataclass, fields
+
+SCHEMA_VERSION = 2
+
+# Seconds to wait after a change before writing, so a run of toggles in the
+# settings menu becomes one write.
+SAVE_DELAY = 0.5
+
+# Environment variables are named after the fields, e.g. MORSE_CURRENT_WPM=20.
+ENV_PREFIX = "MORSE_"
+
+# Allowed ranges for numeric settings; values outside them are clamped.
+RANGES = {
+    "current_frequency": (400, 1000),
+    "current_wpm": (5, 40),
+    "farnsworth_wpm": (0, 40),
+    "rise_time_ms": (0, 20),
+}
+
+CHOICES = {
+    "waveform": ("sine", "square"),
+    "audio_backend": ("pygame", "wav", "null"),
+}
+
+
+@dataclass
+class Settings:
+    current_frequency: int = 700
+    current_wpm: int = 10
+    farnsworth_wpm: int = 0
+    waveform: str = "sine"
+    rise_time_ms: int = 5
+    show_morse: bool = True
+    flash_card_mode_enabled: bool = False
+    voice_enabled: bool = False
+    copy_mode_enabled: bool = False
+    audio_backend: str = "pygame"
+    corpus_file: str = ""
+    instrumentation_enabled: bool = False
+
+
+def parse_value(name, value):
+    """Convert a value to the type of the named field. Strings such as 'on' and '20' are accepted."""
+    kind = type(getattr(Settings, name))
+    if kind is bool:
+        if isinstance(value, str):
+            if value.strip().lower() in ("1", "true", "yes", "on"):
+                return True
+            if value.strip().lower() in ("0", "false", "no", "off"):
+                return False
+            raise ValueError(f"{name} must be on or off, not {value!r}")
+        return bool(value)
+    if kind is int:
+        if isinstance(value, bool):
+            raise ValueError(f"{name} must be a number")
+        number = float(value)
+        if not math.isfinite(number):
+            raise ValueError(f"{name} must be a finite number")
+        return int(number)
+    return str(value)
+
+
+def validate(values):
+    """
+    Builds a Settings from a dict, keeping defaults for anything missing or unusable.
+
+    Numbers are clamped to RANGES, unknown choices fall back to the default and
+    Farnsworth speed is turned off unless it is below the character speed.
+
+    Returns:
+        tuple: (Settings, list of problems found)
+    """
+    settings = Settings()
+    problems = []
+    for field in fields(Settings):
+        if field.name not in values:
+            continue
+        try:
+            value = parse_value(field.name, values[field.name])
+        except (TypeError, ValueError, OverflowError):
+            problems.append(f"{field.name}: {values[field.name]!r} is not valid, using {getattr(settings, field.name)!r}")
+            continue
+        if field.name in RANGES:
+            low, high = RANGES[field.name]
+            clamped = min(high, max(low, value))
+            if clamped != value:
+                problems.append(f"{field.name}: {value} is out of range, using {clamped}")
+            value = clamped
+        if field.name in CHOICES and value not in CHOICES[field.name]:
+            problems.append(f"{field.name}: {value!r} is not one of {', '.join(CHOICES[field.name])}")
+            continue
+        setattr(settings, field.name, value)
+
+    if settings.farnsworth_wpm and not 5 <= settings.farnsworth_wpm <= settings.current_wpm:
+        problems.append(f"farnsworth_wpm: {settings.farnsworth_wpm} must be 5 to {settings.current_wpm}, turning it off")
+        settings.farnsworth_wpm = 0
+    return settings, problems
+
+
+# === Migrations ===
+# Each takes the data of one schema version and returns the next.
+def migrate_v1(data):
+    # Version 1 files had no version number; their keys are unchanged.
+    return dict(data, version=2)
+
+
+MIGRATIONS = {
+    1: migrate_v1,
+}
+
+
+def migrate(data):
+    """Bring data up to SCHEMA_VERSION. Raises ValueError if its version makes no sense."""
+    version = data.get("version", 1)
+    if type(version) is not int or version < 1:
+        raise ValueError(f"version {version!r} is not a schema version")
+    while version < SCHEMA_VERSION:
+        data = MIGRATIONS[version](data)
+        version = data["version"]
+    return data
+
+
+def env_overrides(environ=None):
+    """Settings given as MORSE_<FIELD> environment variables."""
+    environ = os.environ if environ is None else environ
+    overrides = {}
+    for field in fields(Settings):
+        value = environ.get(ENV_PREFIX + field.name.upper())
+        if value is not None:
+            overrides[field.name] = value
+    return overrides
+
+
+class SettingsStore:
+    """
+    Holds the settings in memory and keeps the settings file in step with them.
+
+    Changes are written on a timer after SAVE_DELAY seconds, to a temporary
+    file that then replaces the real one, so a crash never leaves a partial
+    file. Overridden settings apply in memory only: the file keeps its own
+    values for them, and with save=False it is never written at all.
+
+    Args:
+        path (str): Settings file.
+        overrides (dict): Field values that take precedence over the file.
+        save (bool): Whether changes may be written to the file.
+    """
+
+    def __init__(self, path, overrides=None, save=True):
+        self.path = path
+        self.save_enabled = save
+        self.lock = threading.Lock()
+        self.timer = None
+        self.stored = self._read()
+        self.overrides = {}
+        self.settings = self.stored
+        self.override(overrides or {})
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return Settings()
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("not a JSON object")
+            data = migrate(data)
+        except (OSError, ValueError) as error:
+            print(f"Warning: {self.path} could not be read ({error}); using default settings.")
+            if self.save_enabled:
+                # Keep the damaged file for inspection rather than overwriting it.
+                os.replace(self.path, self.path + ".corrupt")
+            return Settings()
+
+        settings, problems = validate(data)
+        for problem in problems:
+            print(f"Warning: {self.path}: {problem}")
+        return settings
+
+    def override(self, values):
+        """Apply overrides in memory. Returns the problems found validating them."""
+        self.overrides.update(values)
+        merged = dict(asdict(self.stored), **self.overrides)
+        self.settings, problems = validate(merged)
+        return problems
+
+    def update(self, **values):
+        """Change settings and schedule a save. Returns the problems found validating them."""
+        previous = asdict(self.settings)
+        settings, problems = validate(dict(previous, **values))
+        with self.lock:
+            self.settings = settings
+            # A setting changed on purpose is no longer just an override.
+            for name, value in values.items():
+                if value != previous[name]:
+                    self.overrides.pop(name, None)
+            current = asdict(settings)
+            stored = asdict(self.stored)
+            # Overridden fields keep whatever the file already had.
+            self.stored = Settings(**{name: stored[name] if name in self.overrides else current[name]
+                                      for name in current})
+            self._schedule()
+        return problems
+
+    def _schedule(self):
+        if not self.save_enabled:
+            return
+        if self.timer is not None:
+            self.timer.cancel()
+        self.timer = threading.Timer(SAVE_DELAY, self.flush)
+        self.timer.start()
+
+    def flush(self):
+        """Write any pending change now."""
+        with self.lock:
+            if self.timer is None:
+                return
+            self.timer.cancel()
+            self.timer = None
+            data = dict(asdict(self.stored), version=SCHEMA_VERSION)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(data, f, indent=2)
+            os.replace(temp_path, self.path)
+
+    def close(self):
+        self.flush()
@@ -0,0 +1,230 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# Frames handed to the output at a time; about 23 ms at 44.1 kHz.
+BLOCK_FRAMES = 1024
+
+# How often the output thread checks whether the mixer is ready for more.
+POLL_INTERVAL = 0.002
+
+
+class RingBuffer:
+    """
+    Fixed-size buffer of int16 frames shared by one writer and one reader.
+
+    Writers block while the buffer is full, so a producer can never run more
+    than the buffer's length ahead of playback.
+    """
+
+    def __init__(self, frames, channels):
+        self.data = np.zeros((frames, channels), dtype=np.int16)
+        self.capacity = frames
+        self.read_index = 0
+        self.count = 0
+        self.closed = False
+        self.condition = threading.Condition()
+        self.writer_waits = 0
+
+    def write(self, samples):
+        """Write all samples, waiting for space. Returns False if the buffer was closed."""
+        samples = samples.reshape(len(samples), -1)
+        offset = 0
+        with self.condition:
+            while offset < len(samples):
+                while self.count == self.capacity and not self.closed:
+                    self.writer_waits += 1
+                    self.condition.wait()
+                if self.closed:
+                    return False
+                offset += self._put(samples[offset:])
+                self.condition.notify_all()
+        return True
+
+    def read(self, frames, timeout):
+        """
+        Read up to frames, waiting up to timeout for a full block.
+
+        A short block is returned only once the buffer has been closed, or when
+        the timeout runs out; None means nothing at all was available.
+        """
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while self.count < frames and not self.closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            if self.count == 0:
+                return None
+            block = self._take(min(frames, self.count))
+            self.condition.notify_all()
+            return block
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def _put(self, samples):
+        write_index = (self.read_index + self.count) % self.capacity
+        n = min(len(samples), self.capacity - self.count, self.capacity - write_index)
+        self.data[write_index:write_index + n] = samples[:n]
+        self.count += n
+        return n
+
+    def _take(self, frames):
+        first = min(frames, self.capacity - self.read_index)
+        block = np.concatenate((self.data[self.read_index:self.read_index + first],
+                                self.data[:frames - first]))
+        self.read_index = (self.read_index + frames) % self.capacity
+        self.count -= frames
+        return block
+
+
+class PygameChannelOutput:
+    """Plays blocks back to back on one reserved pygame mixer channel."""
+
+    def __init__(self):
+        import pygame
+        self.pygame = pygame
+        pygame.mixer.set_reserved(1)
+        self.channel = pygame.mixer.Channel(0)
+
+    def ready(self):
+        # One block playing and one queued behind it is enough to never run dry.
+        return self.channel.get_queue() is None
+
+    def idle(self):
+        return not self.channel.get_busy()
+
+    def submit(self, block):
+        if block.shape[1] == 1:
+            block = block[:, 0]
+        sound = self.pygame.sndarray.make_sound(np.ascontiguousarray(block))
+        if self.channel.get_busy():
+            self.channel.queue(sound)
+        else:
+            self.channel.play(sound)
+
+    def pause(self):
+        self.channel.pause()
+
+    def resume(self):
+        self.channel.unpause()
+
+    def stop(self):
+        self.channel.stop()
+
+
+class AudioStream:
+    """
+    Streams rendered audio from a generator through a ring buffer to an output.
+
+    A producer thread pulls (label, buffer) items from the generator and writes
+    them into the ring buffer, blocking when it is full. An output thread moves
+    fixed-size blocks from the ring buffer to the output as soon as it can take
+    them, so playback follows the sample clock and memory use stays constant
+    however long the drill runs. When an item's first block is handed to the
+    output, on_marker is called with its label.
+
+    Args:
+        items (iterable): (label, buffer) pairs; buffers are int16 arrays.
+        output: Where blocks are played, such as PygameChannelOutput.
+        sample_rate (int): Sample rate of the buffers.
+        channels (int): Channel count of the buffers.
+        buffer_seconds (float): Length of the ring buffer.
+        on_marker (callable): Called with each label as its audio starts.
+    """
+
+    def __init__(self, items, output, sample_rate=44100, channels=2, buffer_seconds=2.0, on_marker=None):
+        self.items = items
+        self.output = output
+        self.sample_rate = sample_rate
+        self.ring = RingBuffer(int(sample_rate * buffer_seconds), channels)
+        self.on_marker = on_marker
+        self.markers = deque()
+        self.frames_written = 0
+        self.frames_played = 0
+        self.blocks_played = 0
+        self.underruns = 0
+        self.paused = threading.Event()
+        self.stopped = threading.Event()
+        self.finished = threading.Event()
+        self.producer = threading.Thread(target=self._produce, name="stream-producer", daemon=True)
+        self.consumer = threading.Thread(target=self._consume, name="stream-output", daemon=True)
+
+    def start(self):
+        self.producer.start()
+        self.consumer.start()
+        return self
+
+    def pause(self):
+        self.paused.set()
+        self.output.pause()
+
+    def resume(self):
+        self.output.resume()
+        self.paused.clear()
+
+    def stop(self):
+        self.stopped.set()
+        self.ring.close()
+        self.output.stop()
+        self.producer.join()
+        self.consumer.join()
+
+    def stats(self):
+        return {
+            "frames_played": self.frames_played,
+            "blocks_played": self.blocks_played,
+            "underruns": self.underruns,
+            "producer_waits": self.ring.writer_waits,
+            "buffered_frames": self.ring.count,
+        }
+
+    def _produce(self):
+        try:
+            for label, buffer in self.items:
+                if self.stopped.is_set():
+                    return
+                self.markers.append((self.frames_written, label))
+                if not self.ring.write(buffer):
+                    return
+                self.frames_written += len(buffer)
+        finally:
+            self.ring.close()
+
+    def _consume(self):
+        dry = False
+        while not self.stopped.is_set():
+            if self.paused.is_set() or not self.output.ready():
+                time.sleep(POLL_INTERVAL)
+                continue
+
+            block = self.ring.read(BLOCK_FRAMES, POLL_INTERVAL)
+            if block is None:
+                if self.ring.closed:
+                    break
+                # Count each time the output actually goes silent, not each empty poll.
+                if self.blocks_played and self.output.idle() and not dry:
+                    self.underruns += 1
+                    dry = True
+                continue
+            dry = False
+
+            end = self.frames_played + len(block)
+            while self.markers and self.markers[0][0] < end:
+                _, label = self.markers.popleft()
+                if self.on_marker is not None:
+                    self.on_marker(label)
+            self.output.submit(block)
+            self.frames_played = end
+            self.blocks_played += 1
+
+        # Let the last blocks play out before reporting the stream finished.
+        while not self.stopped.is_set() and not self.output.idle():
+            time.sleep(POLL_INTERVAL)
+        self.finished.set()
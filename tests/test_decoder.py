@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from decoder import MorseDecoder
+from morse_tree import MorseTree
+from render import render_text
+from timing import element_durations
+
+CODE = {
+    'A': '.-', 'B': '-...', 'C': '-.-.', 'D': '-..', 'E': '.', 'F': '..-.', 'G': '--.', 'H': '....',
+    'I': '..', 'J': '.---', 'K': '-.-', 'L': '.-..', 'M': '--', 'N': '-.', 'O': '---', 'P': '.--.',
+    'Q': '--.-', 'R': '.-.', 'S': '...', 'T': '-', 'U': '..-', 'V': '...-', 'W': '.--', 'X': '-..-',
+    'Y': '-.--', 'Z': '--..', '0': '-----', '1': '.----', '2': '..---', '3': '...--', '4': '....-',
+    '5': '.....', '6': '-....', '7': '--...', '8': '---..', '9': '----.',
+}
+SAMPLE_RATE = 8000
+
+
+def decode(text, wpm, farnsworth=0):
+    buffer = render_text(text, CODE, 700, element_durations(wpm, farnsworth), SAMPLE_RATE, channels=1)
+    decoder = MorseDecoder(MorseTree(CODE), SAMPLE_RATE)
+    return (decoder.feed(buffer) + decoder.flush()).strip()
+
+
+@pytest.mark.parametrize("text", ["A MAN MET ME", "I AM A MAN", "5 5 5"])
+def test_first_word_of_one_letter_keeps_its_space(text):
+    assert decode(text, 20) == text
+
+
+@pytest.mark.parametrize("text", ["A MAN MET ME", "TEST", "MOM SET"])
+def test_farnsworth_letter_gaps_are_not_word_gaps(text):
+    assert decode(text, 20, 10) == text
+
+
+@pytest.mark.parametrize("text", ["42FN 42LT 6NJZ3", "SL KUR ID D0LHA", "EW 5GU4B W72038 T2J83"])
+def test_word_spacing_survives_keying_bias_at_40_wpm(text):
+    assert decode(text, 40) == text
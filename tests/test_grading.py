@@ -0,0 +1,27 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grading import CopyGrader
+
+
+def test_typing_every_candidate_is_not_a_correct_copy():
+    grader = CopyGrader()
+    for letter in "ETIANM":
+        assert grader.grade(letter, "ETIANM") == [(letter, "ETIANM", False)]
+    assert grader.accuracy == 0.0
+    assert grader.extra == 30
+
+
+def test_extra_character_marks_its_neighbour_wrong():
+    grader = CopyGrader()
+    results = grader.grade("HI THERE", "HI THEERE")
+    assert [correct for _, _, correct in results] == [True, True, True, True, False, True, True]
+    assert grader.extra == 1
+
+
+def test_extra_spaces_are_not_scored():
+    grader = CopyGrader()
+    assert all(correct for _, _, correct in grader.grade("HI THERE", " HI   THERE "))
+    assert grader.extra == 0
@@ -0,0 +1,85 @@
+from collections import namedtuple
+from functools import lru_cache
+
+# Gap lengths in dot units at the character speed.
+ELEMENT_GAP = 1
+LETTER_GAP = 3
+WORD_GAP = 7
+
+# Durations in seconds of every keying element and gap.
+Timing = namedtuple("Timing", "dot dash element_gap letter_gap word_gap")
+
+
+def dot_length(wpm):
+    """Length of one dot in seconds, using the 50-unit word PARIS."""
+    return 60.0 / (wpm * 50.0)
+
+
+def element_durations(char_wpm, effective_wpm=0):
+    """
+    Computes element and gap durations, with optional Farnsworth spacing.
+
+    Characters are always sent at char_wpm. When effective_wpm is lower, the
+    letter and word gaps are stretched (ARRL Farnsworth timing) so that the
+    overall speed drops to effective_wpm.
+
+    Args:
+        char_wpm (int): Character speed in words per minute.
+        effective_wpm (int): Overall speed in words per minute, 0 for none.
+
+    Returns:
+        Timing: Durations in seconds.
+    """
+    dot = dot_length(char_wpm)
+    letter_gap = dot * LETTER_GAP
+    word_gap = dot * WORD_GAP
+    if 0 < effective_wpm < char_wpm:
+        # Total delay per word, shared 3:7 between the letter and word gaps.
+        delay = (60.0 * char_wpm - 37.2 * effective_wpm) / (char_wpm * effective_wpm)
+        letter_gap = delay * LETTER_GAP / 19.0
+        word_gap = delay * WORD_GAP / 19.0
+    return Timing(dot, dot * 3, dot * ELEMENT_GAP, letter_gap, word_gap)
+
+
+@lru_cache(maxsize=256)
+def pattern_timeline(pattern, timing):
+    """Timeline for a single dot-dash pattern, ending with a letter gap."""
+    events = []
+    for symbol in pattern:
+        events.append((True, timing.dot if symbol == '.' else timing.dash))
+        events.append((False, timing.element_gap))
+    if events:
+        events[-1] = (False, timing.letter_gap)
+    return tuple(events)
+
+
+def build_timeline(text, code_table, timing):
+    """
+    Builds the keying schedule for text.
+
+    Args:
+        text (str): The text to schedule. Characters missing from the table are skipped.
+        code_table (dict): Mapping of characters to dot-dash patterns.
+        timing (Timing): Element and gap durations.
+
+    Returns:
+        list: (key_down, seconds) events in the order they are sent.
+    """
+    events = []
+    for char in text.upper():
+        if char == ' ':
+            # A word gap replaces the letter gap that ends the previous character.
+            if events and not events[-1][0]:
+                events[-1] = (False, timing.word_gap)
+            elif not events:
+                events.append((False, timing.word_gap))
+            continue
+
+        pattern = code_table.get(char)
+        if pattern:
+            events.extend(pattern_timeline(pattern, timing))
+    return events
+
+
+def timeline_duration(events):
+    return sum(seconds for _, seconds in events)
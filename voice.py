@@ -1,8 +1,227 @@
-import pyttsx3
+import os
+import platform
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
 
-# Initialize the text-to-speech engine
-engine = pyttsx3.init()
 
-# Speak the word "Hello"
-engine.say("Hello")
-engine.runAndWait()
\ No newline at end of file
+# === Speech Backends ===
+class SpeechBackend:
+    """A text-to-speech engine used by SpeechWorker."""
+    name = "none"
+    # Whether synthesize() may be called from threads other than the one that speaks.
+    thread_safe = True
+
+    def speak(self, text):
+        """Speak text aloud and return once it has been spoken."""
+        raise NotImplementedError
+
+    def synthesize(self, text):
+        """Return the spoken text as WAV bytes, or None if the engine can't."""
+        return None
+
+    def close(self):
+        pass
+
+
+class EspeakBackend(SpeechBackend):
+    name = "espeak"
+
+    def speak(self, text):
+        subprocess.run(["espeak", text])
+
+    def synthesize(self, text):
+        result = subprocess.run(["espeak", "--stdout", text], capture_output=True)
+        return result.stdout or None
+
+
+class SayBackend(SpeechBackend):
+    name = "say"
+
+    def speak(self, text):
+        # Use lowercase to avoid "capital" being spoken
+        subprocess.run(["say", text.lower()])
+
+    def synthesize(self, text):
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            subprocess.run(["say", "-o", path, "--data-format=LEI16@22050", text.lower()])
+            with open(path, "rb") as f:
+                return f.read() or None
+        finally:
+            os.remove(path)
+
+
+class Pyttsx3Backend(SpeechBackend):
+    """pyttsx3 engine, started on first use from the thread that speaks."""
+    name = "pyttsx3"
+    thread_safe = False
+
+    def __init__(self, pyttsx3):
+        self.pyttsx3 = pyttsx3
+        self.engine = None
+
+    def get_engine(self):
+        if self.engine is None:
+            self.engine = self.pyttsx3.init()
+        return self.engine
+
+    def speak(self, text):
+        engine = self.get_engine()
+        engine.say(text)
+        engine.runAndWait()
+
+    def synthesize(self, text):
+        engine = self.get_engine()
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            engine.save_to_file(text, path)
+            engine.runAndWait()
+            with open(path, "rb") as f:
+                return f.read() or None
+        finally:
+            os.remove(path)
+
+    def close(self):
+        if self.engine is not None:
+            self.engine.stop()
+
+
+class NullBackend(SpeechBackend):
+    """Records what would have been spoken. Useful for tests and headless runs."""
+    name = "null"
+
+    def __init__(self, wav=None):
+        self.spoken = []
+        self.wav = wav
+
+    def speak(self, text):
+        self.spoken.append(text)
+
+    def synthesize(self, text):
+        return self.wav
+
+
+def default_backend():
+    """Pick the speech backend for this platform."""
+    system = platform.system()
+    if system == "Darwin":
+        return SayBackend()
+    elif system == "Linux":
+        if shutil.which("espeak"):
+            return EspeakBackend()
+    elif system == "Windows":
+        try:
+            import pyttsx3
+        except ImportError:
+            print("Error: pyttsx3 is not installed. Run: pip install pyttsx3")
+        else:
+            return Pyttsx3Backend(pyttsx3)
+    return NullBackend()
+
+
+# === Speech Worker ===
+class SpeechWorker:
+    """
+    Speaks queued text on a background thread so the caller never blocks.
+
+    When a player is given and the backend can produce WAV output, each text is
+    synthesized once and the cached audio is handed to the player afterwards,
+    so repeated letters cost no further synthesis.
+
+    Args:
+        backend (SpeechBackend): The engine that produces speech.
+        player (callable): Optional function that plays WAV bytes and returns
+            when playback has finished.
+    """
+
+    def __init__(self, backend, player=None):
+        self.backend = backend
+        self.player = player
+        self.cache = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="speech", daemon=True)
+        self.thread.start()
+
+    def say(self, text):
+        """Queue text to be spoken and return immediately."""
+        self.queue.put(text)
+
+    def prepare(self, text):
+        """
+        Synthesize text now, on the calling thread, so saying it later costs nothing.
+
+        Returns:
+            bytes: The cached WAV audio, or None if it will be synthesized when spoken.
+        """
+        wav = self.cache.get(text)
+        if wav is None and self.player is not None and self.backend.thread_safe:
+            wav = self.backend.synthesize(text)
+            if wav is not None:
+                self.cache[text] = wav
+        return wav
+
+    def wait(self):
+        """Block until everything queued so far has been spoken."""
+        self.queue.join()
+
+    def busy(self):
+        """True while anything queued is still being spoken."""
+        return self.queue.unfinished_tasks > 0
+
+    def cancel(self):
+        """Drop anything that has been queued but not started yet."""
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                return
+            self.queue.task_done()
+
+    def close(self):
+        self.cancel()
+        self.queue.put(None)
+        self.thread.join()
+        self.backend.close()
+
+    def _run(self):
+        while True:
+            text = self.queue.get()
+            try:
+                if text is None:
+                    return
+                self._speak(text)
+            except Exception as e:
+                print(f"[DEBUG] speech failed: {e}")
+            finally:
+                self.queue.task_done()
+
+    def _speak(self, text):
+        if self.player is None:
+            self.backend.speak(text)
+            return
+
+        wav = self.cache.get(text)
+        if wav is not None:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+            wav = self.backend.synthesize(text)
+            if wav is None:
+                self.backend.speak(text)
+                return
+            self.cache[text] = wav
+        self.player(wav)
+
+
+if __name__ == "__main__":
+    worker = SpeechWorker(default_backend())
+    worker.say("Hello")
+    worker.wait()
+    worker.close()